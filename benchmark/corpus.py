@@ -0,0 +1,120 @@
+import random
+
+from processor.dd_cluster import UnionFind
+
+# common characters used to build the synthetic vocabulary
+CHARACTERS = (
+    "的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说产种面而方后多定行学法所民得经"
+    "十三之进着等部度家电力里如水化高自二理起小物现实加量都两体制机当使点从业本去把性好应开它合还因由其些然前外天政四日那社义事平形相全表间样与关各重新线内数正心反你明看原又么利比或但质气第向道命此变条只没结解问意建月公无系军很情者最立代想已通并提直题党程展五果料象员革位入常文总次品式活设及管特件长求老头基资边流路级少图山统接知较将组见计别她手角期根论运农指几九区强放决西被干做必战先回则任取据处理府研质信"
+    "市场公司银行股票基金投资经济金融科技企业政府城市发展改革合作项目平台产品服务用户数据网络安全能源汽车电池芯片医疗教育旅游文化体育比赛球队赛季冠军"
+)
+# fixed news vocabulary mixed into every title
+NEWS_WORDS = [
+    '比特币', '人民币', '美元', '央行', '股市', '上涨', '下跌', '突破', '失守', '创新高', '发布', '宣布', '签署', '启动', '完成',
+    '同比增长', '环比下降', '季度', '年度', '报告', '会议', '政策', '措施', '市场', '行业', '龙头', '新能源', '人工智能', '芯片',
+]
+
+
+class SyntheticCorpus:
+    """
+    Reproducible synthetic Chinese news-title corpus with injected near duplicates.
+
+    Every original title is a random sequence of words drawn from a large random
+    vocabulary plus common news words, so originals are very unlikely to be
+    similar to each other. A dup_rate share of the rows are edited copies of an
+    earlier original, made by one of EDITS: inserting or deleting words,
+    reordering two halves, or cutting out a substring. The true cluster of each
+    row is kept for scoring.
+    """
+
+    EDITS = ('insert', 'delete', 'reorder', 'substring')
+
+    def __init__(self, size, dup_rate=0.2, seed=0, vocabulary_size=20000, edits=EDITS):
+        self.size = size
+        self.dup_rate = dup_rate
+        self.seed = seed
+        self.edits = tuple(edits)
+        self.random = random.Random(seed)
+        self.vocabulary = self.build_vocabulary(vocabulary_size)
+        self.articles = []
+        self.clusters = {}
+        self.generate()
+
+    def build_vocabulary(self, vocabulary_size):
+        words = set()
+        while len(words) < vocabulary_size:
+            words.add(''.join(self.random.choices(CHARACTERS, k=self.random.choice((2, 2, 3, 4)))))
+        return sorted(words)
+
+    def title(self):
+        words = self.random.choices(self.vocabulary, k=self.random.randint(6, 10))
+        for _ in range(self.random.randint(1, 2)):
+            words.insert(self.random.randrange(len(words) + 1), self.random.choice(NEWS_WORDS))
+        if self.random.random() < 0.3:
+            words.insert(self.random.randrange(len(words) + 1), f"{self.random.randint(1, 999)}亿")
+        return words
+
+    def edit(self, words, edit):
+        words = list(words)
+        if edit == 'insert':
+            for _ in range(self.random.randint(1, 2)):
+                words.insert(self.random.randrange(len(words) + 1), self.random.choice(('！', '，', '快讯：', '最新', '重磅')))
+        elif edit == 'delete':
+            del words[self.random.randrange(len(words))]
+        elif edit == 'reorder':
+            cut = self.random.randint(1, len(words) - 1)
+            words = words[cut:] + ['，'] + words[:cut]
+        elif edit == 'substring':
+            keep = max(len(words) * 3 // 4, 2)
+            start = self.random.randint(0, len(words) - keep)
+            words = words[start:start + keep]
+        else:
+            raise ValueError(f"Unknown edit '{edit}', expected one of {SyntheticCorpus.EDITS}")
+        return words
+
+    def generate(self):
+        originals = []
+        for doc_id in range(1, self.size + 1):
+            if originals and self.random.random() < self.dup_rate:
+                source_id, words = self.random.choice(originals)
+                words = self.edit(words, self.random.choice(self.edits))
+                self.clusters[doc_id] = self.clusters[source_id]
+            else:
+                words = self.title()
+                originals.append((doc_id, words))
+                self.clusters[doc_id] = doc_id
+            self.articles.append({'id': doc_id, 'title': ''.join(words)})
+
+    def true_pair_count(self):
+        sizes = {}
+        for cluster in self.clusters.values():
+            sizes[cluster] = sizes.get(cluster, 0) + 1
+        return sum(n * (n - 1) // 2 for n in sizes.values())
+
+    def score(self, similar_pairs):
+        """
+        Returns pairwise precision and recall of similar_pairs after transitive clustering.
+
+        Two rows count as predicted duplicates when they end up in the same
+        predicted cluster, so chained pairs are scored the way DdProcessor
+        deletes them. Pairs are counted from cluster sizes, never enumerated.
+        """
+        union_find = UnionFind()
+        for pair in similar_pairs:
+            union_find.union(pair['id1'], pair['id2'])
+
+        predicted = 0
+        correct = 0
+        for members in union_find.groups().values():
+            predicted += len(members) * (len(members) - 1) // 2
+            overlap = {}
+            for doc_id in members:
+                cluster = self.clusters[doc_id]
+                overlap[cluster] = overlap.get(cluster, 0) + 1
+            correct += sum(n * (n - 1) // 2 for n in overlap.values())
+
+        expected = self.true_pair_count()
+        return {
+            'precision': correct / predicted if predicted else 1.0,
+            'recall': correct / expected if expected else 1.0,
+        }
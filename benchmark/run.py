@@ -0,0 +1,93 @@
+import sys
+import json
+import time
+import argparse
+import jieba
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+from benchmark.corpus import SyntheticCorpus
+from processor.dd_algorithm import TfidfSimilarity, SimhashSimilarity, MinHashSimilarity
+from processor.dd_report import DdReport
+
+STRATEGIES = {
+    'tfidf': TfidfSimilarity,
+    'simhash': SimhashSimilarity,
+    'minhash': MinHashSimilarity,
+}
+
+
+def run_case(method, size, threshold, dup_rate, seed, tokenizer):
+    """
+    Generates the corpus and runs one strategy over it, returning timing, memory and quality.
+
+    Called in a fresh process per case so the peak RSS belongs to this case alone.
+    """
+    corpus = SyntheticCorpus(size, dup_rate=dup_rate, seed=seed)
+    # keep the one-off dictionary load out of the timing
+    jieba.initialize()
+    rss_before = DdReport.peak_rss_mb()
+    report = DdReport()
+    strategy = STRATEGIES[method](tokenizer=tokenizer, report=report)
+
+    start_time = time.perf_counter()
+    similar_pairs = strategy.find_similar_pairs(corpus.articles, 'title', threshold, 'id')
+    seconds = time.perf_counter() - start_time
+
+    result = {
+        'method': method,
+        'size': size,
+        'threshold': threshold,
+        'tokenizer': tokenizer,
+        'seconds': round(seconds, 3),
+        'rows_per_sec': round(size / seconds, 1) if seconds > 0 else None,
+        'corpus_rss_mb': rss_before,
+        'peak_rss_mb': DdReport.peak_rss_mb(),
+        'pairs': len(similar_pairs),
+        **{key: round(value, 4) for key, value in corpus.score(similar_pairs).items()},
+        'stages': {},
+    }
+    for stage in report.stages:
+        result['stages'][stage['stage']] = round(result['stages'].get(stage['stage'], 0) + stage['wall_seconds'], 3)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the dedup strategies on a synthetic Chinese near-duplicate corpus.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000], help='Corpus sizes to run')
+    parser.add_argument('--methods', nargs='+', default=list(STRATEGIES), choices=list(STRATEGIES), help='Strategies to compare')
+    parser.add_argument('--threshold', type=float, default=0.7, help='Similarity threshold passed to every strategy')
+    parser.add_argument('--dup-rate', type=float, default=0.2, help='Share of rows that are edited copies of an earlier row')
+    parser.add_argument('--seed', type=int, default=0, help='Corpus seed, the same seed gives the same corpus')
+    parser.add_argument('--tokenizer', default='jieba', choices=['jieba', 'char'], help='Tokenizer used by every strategy')
+    parser.add_argument('--output', type=str, default=None, help='Write the results as JSON to this file')
+    
+    args = parser.parse_args()
+    
+    results = []
+    print(f"{'method':<8} {'size':>8} {'seconds':>9} {'rows/s':>10} {'peak MB':>9} {'precision':>9} {'recall':>7}")
+    for size in args.sizes:
+        for method in args.methods:
+            # spawn a clean interpreter per case, so memory and jieba state do not carry over
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+                result = executor.submit(run_case, method, size, args.threshold, args.dup_rate, args.seed, args.tokenizer).result()
+            results.append(result)
+            print(
+                f"{method:<8} {size:>8} {result['seconds']:>9.2f} {result['rows_per_sec'] or 0:>10.0f} "
+                f"{result['peak_rss_mb'] or 0:>9.1f} {result['precision']:>9.3f} {result['recall']:>7.3f}"
+            )
+    
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print("------")
+        print(f"Results have been written to {args.output}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,10 @@
 import os
 import configparser
-from processor.db_mysql_utils import DatabaseUtils
+from processor.db_backend import DatabaseBackend
 from processor.dd_processor import DdProcessor
+from processor.dd_cache import DdCache
+from processor.dd_report import DdReport
+from processor.dd_storage import FileStorage
 
 def main():
     config = configparser.ConfigParser()
@@ -10,34 +13,65 @@ def main():
     db_config = config['database']
     file_config = config['files']
     processor_config = config['processor']
+    cache_config = config['cache'] if config.has_section('cache') else {}
+    storage_config = config['storage'] if config.has_section('storage') else {}
+    report = DdReport.from_config(config['reporting'] if config.has_section('reporting') else {})
     
-    # create connection
-    connection = DatabaseUtils.create_connection(
-        db_config['host'], 
-        db_config['user'], 
-        db_config['password'], 
-        db_config['database']
-    )
+    cache = None
+    if cache_config and cache_config.getboolean('enabled', fallback=False):
+        cache = DdCache(cache_config['path'], cache_config.getint('max_entries', fallback=1000000))
+    
+    if storage_config and storage_config.get('backend', fallback='mysql') == 'file':
+        # dedup file to file, no database involved
+        storage = FileStorage(storage_config['input_file'], storage_config.getint('chunk_size', fallback=5000))
+        processor = DdProcessor.from_config(processor_config, cache, report)
+        processor.dd_file(
+            storage,
+            DdProcessor.parse_columns(processor_config['process_column']),
+            storage_config['output_file'],
+            storage_config.get('pairs_file', fallback='') or None
+        )
+        if 'cluster_excel' in file_config:
+            processor.export_clusters(file_config['cluster_excel'])
+        if cache is not None:
+            print(f"Cache hits: {cache.hits}, misses: {cache.misses}")
+            cache.close()
+        report.save()
+        return
+    
+    # create connection, mysql or a local sqlite file
+    backend = DatabaseBackend.from_config(storage_config.get('backend', fallback='mysql') if storage_config else 'mysql', db_config)
+    connection = backend.connect()
+    
+    incremental = processor_config.get('mode', fallback='full') == 'incremental'
     
     if connection:
-        # load excel and database
-        DatabaseUtils.drop_table_if_exists(connection, db_config['tablename'])
-        DatabaseUtils.load_excel_to_mysql(file_config['input_excel'], "articles_info", connection)
-        DatabaseUtils.alter_column_type(connection, db_config['tablename'], "id", "INT", set_primary_key=True)
-        DatabaseUtils.show_table_structure(connection, db_config['tablename'])
+        # load excel and database, incremental runs work on the rows already in the table
+        if not incremental:
+            backend.drop_table_if_exists(connection, db_config['tablename'])
+            with report.stage('load'):
+                backend.load_excel(file_config['input_excel'], "articles_info", connection, db_config.getint('batch_size', fallback=5000))
+            backend.show_table_structure(connection, db_config['tablename'])
         
         # process data
-        processor = DdProcessor(
-            threshold = float(processor_config['threshold']), 
-            method=processor_config['method']
-        )
-        processor.dd_similarity(connection, processor_config['process_column'])
+        processor = DdProcessor.from_config(processor_config, cache, report, backend)
+        if incremental:
+            processor.dd_incremental(connection, DdProcessor.parse_columns(processor_config['process_column']), processor_config['index_path'])
+        else:
+            processor.dd_similarity(connection, DdProcessor.parse_columns(processor_config['process_column']))
+        if cache is not None:
+            print(f"Cache hits: {cache.hits}, misses: {cache.misses}")
+            cache.close()
         
         # export to excel
-        DatabaseUtils.export_mysql_to_excel(file_config['output_excel'], db_config['tablename'], connection)
+        with report.stage('export'):
+            backend.export_to_excel(file_config['output_excel'], db_config['tablename'], connection)
+        if 'cluster_excel' in file_config:
+            processor.export_clusters(file_config['cluster_excel'])
         
         connection.close()
         print("Connection closed.")
+        report.save()
         
 if __name__ == "__main__":
     script_dir = os.path.dirname(os.path.abspath(__file__))
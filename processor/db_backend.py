@@ -0,0 +1,173 @@
+import sqlite3
+import mysql.connector
+from abc import ABC, abstractmethod
+from .db_mysql_utils import DatabaseUtils
+from .db_sqlite_utils import SqliteUtils, SqliteConnection
+from .db_sharded import ShardedReader
+
+
+class DatabaseBackend(ABC):
+    """
+    The database operations the dedup pipeline needs, so MySQL and SQLite are interchangeable.
+
+    Cursors of every backend accept %s placeholders and dictionary=True, so
+    plain SELECTs and the incremental watermark query run unchanged; only the
+    statements that differ between databases go through the backend.
+    """
+
+    name = None
+
+    def __init__(self, read_shards=1, read_workers=2):
+        self.read_shards = read_shards
+        self.read_workers = read_workers
+
+    @abstractmethod
+    def connect(self):
+        pass
+
+    @abstractmethod
+    def connection_factory(self):
+        """
+        Returns a callable opening one more connection, for readers running in other threads.
+        """
+        pass
+
+    @abstractmethod
+    def drop_table_if_exists(self, connection, table_name):
+        pass
+
+    @abstractmethod
+    def load_excel(self, file_path, table_name, connection, batch_size=5000):
+        pass
+
+    @abstractmethod
+    def show_table_structure(self, connection, table_name):
+        pass
+
+    @abstractmethod
+    def stream_query(self, connection, query, batch_size=5000):
+        pass
+
+    @abstractmethod
+    def delete_ids(self, cursor, table_name, id_column, ids, batch_size=1000):
+        pass
+
+    @abstractmethod
+    def mark_duplicates(self, cursor, table_name, id_column, duplicates, batch_size=1000):
+        pass
+
+    @abstractmethod
+    def export_to_excel(self, file_path, table_name, connection):
+        pass
+
+    def read_batches(self, connection, query, table_name, id_column, batch_size=5000):
+        """
+        Yields the rows of a SELECT in batches, from read_shards parallel id-range shards when above one.
+        """
+        if self.read_shards > 1:
+            reader = ShardedReader(self.connection_factory(), self.read_shards, self.read_workers, batch_size)
+            return reader.batches(connection, query, table_name, id_column)
+        return self.stream_query(connection, query, batch_size)
+
+    @staticmethod
+    def from_config(backend, db_config):
+        """
+        Builds the backend named by [storage] backend from the [database] section.
+        """
+        read_shards = db_config.getint('read_shards', fallback=1)
+        read_workers = db_config.getint('read_workers', fallback=2)
+        if backend == 'mysql':
+            return MySQLBackend(
+                db_config['host'], db_config['user'], db_config['password'], db_config['database'],
+                pool_size=db_config.getint('pool_size', fallback=1), read_shards=read_shards, read_workers=read_workers
+            )
+        if backend == 'sqlite':
+            return SQLiteBackend(db_config.get('sqlite_path', fallback='./data/articles.sqlite3'), read_shards=read_shards, read_workers=read_workers)
+        raise ValueError(f"Unknown database backend '{backend}', expected 'mysql' or 'sqlite'")
+
+
+class MySQLBackend(DatabaseBackend):
+    name = 'mysql'
+
+    def __init__(self, host=None, user=None, password=None, database=None, pool_size=1, read_shards=1, read_workers=2):
+        super().__init__(read_shards, read_workers)
+        self.host = host
+        self.user = user
+        self.password = password
+        self.database = database
+        self.pool_size = pool_size
+        self.pool = None
+
+    def connect(self):
+        """
+        Opens a connection, taken from a connection pool when pool_size is above one.
+        """
+        if self.pool_size > 1:
+            if self.pool is None:
+                # room for the main connection plus one per shard reader
+                size = max(self.pool_size, self.read_workers + 1) if self.read_shards > 1 else self.pool_size
+                self.pool = DatabaseUtils.create_connection_pool(self.host, self.user, self.password, self.database, min(size, 32))
+            return self.pool.get_connection() if self.pool is not None else None
+        return DatabaseUtils.create_connection(self.host, self.user, self.password, self.database)
+
+    def connection_factory(self):
+        if self.pool is not None:
+            return self.pool.get_connection
+        return lambda: mysql.connector.connect(host=self.host, user=self.user, passwd=self.password, database=self.database)
+
+    def drop_table_if_exists(self, connection, table_name):
+        DatabaseUtils.drop_table_if_exists(connection, table_name)
+
+    def load_excel(self, file_path, table_name, connection, batch_size=5000):
+        DatabaseUtils.load_excel_to_mysql(file_path, table_name, connection, batch_size)
+
+    def show_table_structure(self, connection, table_name):
+        DatabaseUtils.show_table_structure(connection, table_name)
+
+    def stream_query(self, connection, query, batch_size=5000):
+        return DatabaseUtils.stream_query(connection, query, batch_size)
+
+    def delete_ids(self, cursor, table_name, id_column, ids, batch_size=1000):
+        return DatabaseUtils.delete_ids(cursor, table_name, id_column, ids, batch_size)
+
+    def mark_duplicates(self, cursor, table_name, id_column, duplicates, batch_size=1000):
+        return DatabaseUtils.mark_duplicates(cursor, table_name, id_column, duplicates, batch_size)
+
+    def export_to_excel(self, file_path, table_name, connection):
+        DatabaseUtils.export_mysql_to_excel(file_path, table_name, connection)
+
+
+class SQLiteBackend(DatabaseBackend):
+    name = 'sqlite'
+
+    def __init__(self, path=None, read_shards=1, read_workers=2):
+        super().__init__(read_shards, read_workers)
+        self.path = path
+
+    def connect(self):
+        return SqliteUtils.create_connection(self.path)
+
+    def connection_factory(self):
+        # a sqlite connection belongs to the thread that opened it, so each reader opens its own
+        return lambda: sqlite3.connect(self.path, factory=SqliteConnection)
+
+    def drop_table_if_exists(self, connection, table_name):
+        SqliteUtils.drop_table_if_exists(connection, table_name)
+
+    def load_excel(self, file_path, table_name, connection, batch_size=5000):
+        SqliteUtils.load_excel_to_sqlite(file_path, table_name, connection, batch_size)
+
+    def show_table_structure(self, connection, table_name):
+        SqliteUtils.show_table_structure(connection, table_name)
+
+    def stream_query(self, connection, query, batch_size=5000):
+        return SqliteUtils.stream_query(connection, query, batch_size)
+
+    def delete_ids(self, cursor, table_name, id_column, ids, batch_size=1000):
+        return SqliteUtils.delete_ids(cursor, table_name, id_column, ids, batch_size)
+
+    def mark_duplicates(self, cursor, table_name, id_column, duplicates, batch_size=1000):
+        return SqliteUtils.mark_duplicates(cursor, table_name, id_column, duplicates, batch_size)
+
+    def export_to_excel(self, file_path, table_name, connection):
+        SqliteUtils.export_sqlite_to_excel(file_path, table_name, connection)
@@ -1,6 +1,8 @@
 import pandas as pd
 import mysql.connector
+from mysql.connector import pooling
 from mysql.connector import Error
+from .dd_index import SimhashIndex
 
 class DatabaseUtils:
     @staticmethod
@@ -33,6 +35,40 @@ class DatabaseUtils:
         
         return connection
     
+    @staticmethod
+    def create_connection_pool(host_name, user_name, user_password, db_name, pool_size=4, pool_name='dd_pool'):
+        """
+        Creates a pool of MySQL connections, so loading, sharded reads and deletes can each hold their own.
+
+        Parameters:
+        host_name (str): The hostname of the MySQL server.
+        user_name (str): The username to use for authentication.
+        user_password (str): The password to use for authentication.
+        db_name (str): The name of the database to connect to.
+        pool_size (int): The number of pooled connections, at most 32 (default is 4).
+        pool_name (str): The name of the pool (default is 'dd_pool').
+
+        Returns:
+        pool: A MySQLConnectionPool object if the connections are successful, None otherwise.
+        """
+        pool = None
+        try:
+            pool = pooling.MySQLConnectionPool(
+                pool_name=pool_name,
+                pool_size=pool_size,
+                host=host_name,
+                user=user_name,
+                passwd=user_password,
+                database=db_name
+            )
+            print("------")
+            print(f"MySQL connection pool of {pool_size} connections created")
+        except Error as e:
+            print("------")
+            print(f"The error '{e}' occurred")
+        
+        return pool
+
     @staticmethod
     def create_simhash_table(connection, table_name, n=4):
         """
@@ -49,7 +85,7 @@ class DatabaseUtils:
         cursor = connection.cursor()
         
         # Construct the SQL query to create a table with n fields
-        fields = ", ".join([f"part{i+1} BIGINT" for i in range(n)])
+        fields = ", ".join([f"part{i+1} BIGINT UNSIGNED" for i in range(n)])
         create_table_query = f"""
         CREATE TABLE IF NOT EXISTS {table_name} (
             id INT AUTO_INCREMENT PRIMARY KEY,
@@ -68,49 +104,256 @@ class DatabaseUtils:
             print(f"The error '{e}' occurred while creating the table '{table_name}'")
         finally:
             cursor.close()
+
+    @staticmethod
+    def save_simhash_index(connection, table_name, index):
+        """
+        Persists the bands of a SimhashIndex into a table created by create_simhash_table.
+
+        Parameters:
+        connection: A MySQL connection object.
+        table_name (str): The name of the simhash table, created with n equal to index.blocks.
+        index (SimhashIndex): The index whose fingerprints are stored as part1..partN.
+
+        Returns:
+        None
+
+        Raises:
+        ValueError: If a block is wider than the 64 bits of a BIGINT UNSIGNED part (index.blocks == 1).
+        """
+        if index.hash_bits > 64 * index.blocks:
+            raise ValueError(f"{index.blocks} simhash blocks of {index.hash_bits} bits do not fit BIGINT UNSIGNED parts, use at least {-(-index.hash_bits // 64)} blocks")
+        DatabaseUtils.create_simhash_table(connection, table_name, n=index.blocks)
+        cursor = connection.cursor()
+        
+        fields = ", ".join([f"part{i+1}" for i in range(index.blocks)])
+        insert_query = f"""
+        REPLACE INTO {table_name} (id, {fields})
+        VALUES ({', '.join(['%s'] * (index.blocks + 1))})
+        """
+        try:
+            cursor.executemany(insert_query, index.to_rows())
+            connection.commit()
+            print("------")
+            print(f"{len(index)} simhash fingerprints saved into table '{table_name}'.")
+        except Error as e:
+            connection.rollback()
+            print("------")
+            print(f"The error '{e}' occurred while saving simhash index into '{table_name}'")
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def load_simhash_index(connection, table_name, max_distance, blocks=None):
+        """
+        Rebuilds a SimhashIndex from a table written by save_simhash_index.
+
+        Parameters:
+        connection: A MySQL connection object.
+        table_name (str): The name of the simhash table.
+        max_distance (int): The maximum Hamming distance of the rebuilt index.
+        blocks (int): The number of parts stored in the table (default is max_distance + 1).
+
+        Returns:
+        SimhashIndex: The rebuilt index, empty if the table could not be read.
+        """
+        index = SimhashIndex(max_distance, blocks=blocks)
+        cursor = connection.cursor()
+        
+        fields = ", ".join([f"part{i+1}" for i in range(index.blocks)])
+        select_query = f"SELECT id, {fields} FROM {table_name} ORDER BY id"
+        try:
+            cursor.execute(select_query)
+            index = SimhashIndex.from_rows(cursor.fetchall(), max_distance, blocks=index.blocks)
+            print("------")
+            print(f"{len(index)} simhash fingerprints loaded from table '{table_name}'.")
+        except Error as e:
+            print("------")
+            print(f"The error '{e}' occurred while loading simhash index from '{table_name}'")
+        finally:
+            cursor.close()
+        
+        return index
             
     @staticmethod
-    def load_excel_to_mysql(file_path, table_name, connection):
+    def infer_column_types(df, primary_key='id'):
         """
-        Loads data from an Excel file into a MySQL table.
+        Maps DataFrame dtypes to MySQL column definitions.
 
         Parameters:
-        file_path (str): The path to the Excel file.
+        df (DataFrame): The data to be loaded.
+        primary_key (str): The column created as the INT primary key, if present (default is 'id').
+
+        Returns:
+        list: "column TYPE" definitions in DataFrame column order.
+        """
+        definitions = []
+        for col in df.columns:
+            dtype = df[col].dtype
+            if col == primary_key:
+                column_type = "INT PRIMARY KEY"
+            elif pd.api.types.is_bool_dtype(dtype):
+                column_type = "TINYINT(1)"
+            elif pd.api.types.is_integer_dtype(dtype):
+                column_type = "BIGINT"
+            elif pd.api.types.is_float_dtype(dtype):
+                column_type = "DOUBLE"
+            elif pd.api.types.is_datetime64_any_dtype(dtype):
+                column_type = "DATETIME"
+            else:
+                max_length = df[col].dropna().astype(str).str.len().max()
+                column_type = "VARCHAR(255)" if pd.notna(max_length) and max_length <= 255 else "TEXT"
+            definitions.append(f"{col} {column_type}")
+        return definitions
+
+    @staticmethod
+    def load_dataframe_to_mysql(df, table_name, connection, batch_size=5000, primary_key='id'):
+        """
+        Bulk loads a DataFrame into a MySQL table with batched executemany inserts.
+
+        Parameters:
+        df (DataFrame): The data to load.
         table_name (str): The name of the table to create and insert data into.
         connection: A MySQL connection object.
+        batch_size (int): The number of rows sent per executemany call (default is 5000).
+        primary_key (str): The column created as the INT primary key, if present (default is 'id').
 
         Returns:
-        None
+        int: The number of rows loaded.
         """
-        df = pd.read_excel(file_path)
+        for col in df.columns:
+            if pd.api.types.is_datetime64_any_dtype(df[col].dtype):
+                df[col] = pd.Series(df[col].dt.to_pydatetime(), index=df.index, dtype=object)
+        rows = list(df.astype(object).where(pd.notna(df), None).itertuples(index=False, name=None))
 
         cursor = connection.cursor()
         
         create_table_query = f"""
         CREATE TABLE IF NOT EXISTS {table_name} (
-            {', '.join([f'{col} TEXT' for col in df.columns])}
+            {', '.join(DatabaseUtils.infer_column_types(df, primary_key))}
         );
         """
+        insert_query = f"""
+        INSERT INTO {table_name} ({', '.join(df.columns)}) 
+        VALUES ({', '.join(['%s'] * len(df.columns))})
+        """
         try:
             cursor.execute(create_table_query)
             
-            for _, row in df.iterrows():
-                insert_query = f"""
-                INSERT INTO {table_name} ({', '.join(df.columns)}) 
-                VALUES ({', '.join(['%s'] * len(row))})
-                """
-                cursor.execute(insert_query, tuple(row))
+            for start in range(0, len(rows), batch_size):
+                cursor.executemany(insert_query, rows[start:start + batch_size])
             
             connection.commit()
+            return len(rows)
+        except Error:
+            connection.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def load_excel_to_mysql(file_path, table_name, connection, batch_size=5000):
+        """
+        Loads data from an Excel file into a MySQL table.
+
+        Parameters:
+        file_path (str): The path to the Excel file.
+        table_name (str): The name of the table to create and insert data into.
+        connection: A MySQL connection object.
+        batch_size (int): The number of rows sent per executemany call (default is 5000).
+
+        Returns:
+        None
+        """
+        df = pd.read_excel(file_path)
+
+        try:
+            count = DatabaseUtils.load_dataframe_to_mysql(df, table_name, connection, batch_size)
             print("------")
-            print(f"Data from {file_path} has been loaded into {table_name} table.")
+            print(f"{count} rows from {file_path} have been loaded into {table_name} table.")
         except Error as e:
-            connection.rollback()
             print("------")
             print(f"The error '{e}' occurred while loading into table '{table_name}'")
+    
+    @staticmethod
+    def stream_query(connection, query, batch_size=5000):
+        """
+        Runs a SELECT on an unbuffered cursor and yields its rows in batches.
+
+        Parameters:
+        connection: A MySQL connection object.
+        query (str): The SELECT statement to run.
+        batch_size (int): The number of rows fetched per fetchmany call (default is 5000).
+
+        Yields:
+        list: Up to batch_size rows as dicts.
+        """
+        cursor = connection.cursor(dictionary=True, buffered=False)
+        try:
+            cursor.execute(query)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
         finally:
             cursor.close()
-    
+
+    @staticmethod
+    def delete_ids(cursor, table_name, id_column, ids, batch_size=1000):
+        """
+        Deletes rows by id with one batched IN list per statement.
+
+        Parameters:
+        cursor: A cursor of a MySQL connection.
+        table_name (str): The table holding the rows.
+        id_column (str): The id column of the table.
+        ids (list): The ids to delete.
+        batch_size (int): The number of ids per DELETE statement (default is 1000).
+
+        Returns:
+        int: The number of rows deleted.
+        """
+        deleted_count = 0
+        ids = list(ids)
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start:start + batch_size]
+            delete_query = f"DELETE FROM {table_name} WHERE {id_column} IN ({', '.join(['%s'] * len(batch))})"
+            cursor.execute(delete_query, tuple(batch))
+            deleted_count += cursor.rowcount
+        return deleted_count
+
+    @staticmethod
+    def mark_duplicates(cursor, table_name, id_column, duplicates, batch_size=1000):
+        """
+        Sets table_name.dup_of for duplicate rows instead of deleting them.
+
+        Parameters:
+        cursor: A cursor of a MySQL connection.
+        table_name (str): The table holding the rows.
+        id_column (str): The id column of the table.
+        duplicates (dict): Maps each duplicate id to the id of its survivor.
+        batch_size (int): The number of rows sent per executemany call (default is 1000).
+
+        Returns:
+        int: The number of rows marked.
+        """
+        cursor.execute(f"SHOW COLUMNS FROM {table_name} LIKE 'dup_of'")
+        if not cursor.fetchall():
+            cursor.execute(f"ALTER TABLE {table_name} ADD COLUMN dup_of INT NULL")
+        
+        cursor.execute("DROP TEMPORARY TABLE IF EXISTS dd_duplicates")
+        cursor.execute("CREATE TEMPORARY TABLE dd_duplicates (id INT PRIMARY KEY, dup_of INT NOT NULL)")
+        rows = list(duplicates.items())
+        for start in range(0, len(rows), batch_size):
+            cursor.executemany("INSERT INTO dd_duplicates (id, dup_of) VALUES (%s, %s)", rows[start:start + batch_size])
+        cursor.execute(
+            f"UPDATE {table_name} a JOIN dd_duplicates d ON a.{id_column} = d.id SET a.dup_of = d.dup_of"
+        )
+        marked_count = cursor.rowcount
+        cursor.execute("DROP TEMPORARY TABLE dd_duplicates")
+        return marked_count
+
     @staticmethod
     def export_mysql_to_excel(file_path, table_name, connection):
         """
@@ -0,0 +1,68 @@
+import math
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ShardedReader:
+    """
+    Reads a table as id-range shards, each fetched on its own connection in a thread.
+
+    Up to `workers` shards are fetched ahead of the consumer, so while the
+    strategy tokenizes and hashes shard N the next shards are already on the
+    wire. Shards are yielded in id order, split into batch_size row batches.
+    connect is called once per shard and must return a new (or pooled)
+    connection; the shard closes it when done, which hands a pooled
+    connection back to its pool.
+    """
+
+    def __init__(self, connect, shards=4, workers=2, batch_size=5000):
+        self.connect = connect
+        self.shards = shards
+        self.workers = max(workers, 1)
+        self.batch_size = batch_size
+
+    @staticmethod
+    def id_ranges(connection, table_name, id_column, shards):
+        """
+        Splits [MIN(id), MAX(id)] into at most `shards` equal, inclusive id ranges.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT MIN({id_column}), MAX({id_column}) FROM {table_name}")
+            low, high = cursor.fetchone()
+        if low is None:
+            return []
+        step = max(math.ceil((high - low + 1) / shards), 1)
+        return [(start, min(start + step - 1, high)) for start in range(low, high + 1, step)]
+
+    def read_shard(self, query, id_column, low, high):
+        connection = self.connect()
+        try:
+            with connection.cursor(dictionary=True) as cursor:
+                cursor.execute(f"{query} WHERE {id_column} BETWEEN %s AND %s ORDER BY {id_column}", (low, high))
+                return cursor.fetchall()
+        finally:
+            connection.close()
+
+    def batches(self, connection, query, table_name, id_column):
+        """
+        Yields the rows of `query` (a SELECT without WHERE) in batches, shard by shard.
+
+        connection is only used to find the id range of table_name.
+        """
+        ranges = iter(ShardedReader.id_ranges(connection, table_name, id_column, self.shards))
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            pending = deque()
+
+            def submit_next():
+                shard = next(ranges, None)
+                if shard is not None:
+                    pending.append(executor.submit(self.read_shard, query, id_column, *shard))
+
+            for _ in range(self.workers):
+                submit_next()
+            while pending:
+                rows = pending.popleft().result()
+                # keep `workers` shards in flight while this one is consumed
+                submit_next()
+                for start in range(0, len(rows), self.batch_size):
+                    yield rows[start:start + self.batch_size]
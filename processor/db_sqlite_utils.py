@@ -0,0 +1,312 @@
+import os
+import sqlite3
+import pandas as pd
+
+
+class SqliteCursor(sqlite3.Cursor):
+    """
+    sqlite3 cursor accepting the %s placeholders and with-blocks used with mysql.connector cursors.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def execute(self, query, params=()):
+        return super().execute(query.replace('%s', '?'), params)
+
+    def executemany(self, query, rows):
+        return super().executemany(query.replace('%s', '?'), rows)
+
+
+def dict_row(cursor, row):
+    return {column[0]: value for column, value in zip(cursor.description, row)}
+
+
+class SqliteConnection(sqlite3.Connection):
+    """
+    sqlite3 connection whose cursor() takes mysql.connector's dictionary/buffered flags.
+
+    This lets DdProcessor run its queries unchanged on either database.
+    """
+
+    def cursor(self, dictionary=False, buffered=True):
+        cursor = super().cursor(SqliteCursor)
+        if dictionary:
+            cursor.row_factory = dict_row
+        return cursor
+
+
+class SqliteUtils:
+    @staticmethod
+    def create_connection(db_path):
+        """
+        Opens a SQLite database file tuned for bulk dedup runs.
+
+        Parameters:
+        db_path (str): The path of the database file, created if missing.
+
+        Returns:
+        connection: A SqliteConnection object if the connection is successful, None otherwise.
+        """
+        connection = None
+        try:
+            directory = os.path.dirname(db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # the pipelined reader fetches from a thread, never concurrently with the main thread
+            connection = sqlite3.connect(db_path, factory=SqliteConnection, check_same_thread=False)
+            # WAL lets exports read while deletes commit; NORMAL sync is safe with WAL
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("PRAGMA temp_store=MEMORY")
+            connection.execute("PRAGMA cache_size=-65536")
+            print("------")
+            print("Connection to SQLite DB successful")
+        except sqlite3.Error as e:
+            print("------")
+            print(f"The error '{e}' occurred")
+
+        return connection
+
+    @staticmethod
+    def infer_column_types(df, primary_key='id'):
+        """
+        Maps DataFrame dtypes to SQLite column definitions.
+
+        Parameters:
+        df (DataFrame): The data to be loaded.
+        primary_key (str): The column created as the INTEGER primary key, if present (default is 'id').
+
+        Returns:
+        list: "column TYPE" definitions in DataFrame column order.
+        """
+        definitions = []
+        for col in df.columns:
+            dtype = df[col].dtype
+            if col == primary_key:
+                # an INTEGER PRIMARY KEY is the rowid, so id lookups and ranges need no extra index
+                column_type = "INTEGER PRIMARY KEY"
+            elif pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+                column_type = "INTEGER"
+            elif pd.api.types.is_float_dtype(dtype):
+                column_type = "REAL"
+            else:
+                column_type = "TEXT"
+            definitions.append(f"{col} {column_type}")
+        return definitions
+
+    @staticmethod
+    def load_dataframe_to_sqlite(df, table_name, connection, batch_size=5000, primary_key='id'):
+        """
+        Bulk loads a DataFrame into a SQLite table in one transaction.
+
+        Parameters:
+        df (DataFrame): The data to load.
+        table_name (str): The name of the table to create and insert data into.
+        connection: A SqliteConnection object.
+        batch_size (int): The number of rows sent per executemany call (default is 5000).
+        primary_key (str): The column created as the INTEGER primary key, if present (default is 'id').
+
+        Returns:
+        int: The number of rows loaded.
+        """
+        for col in df.columns:
+            if pd.api.types.is_datetime64_any_dtype(df[col].dtype):
+                df[col] = df[col].dt.strftime('%Y-%m-%d %H:%M:%S')
+        rows = list(df.astype(object).where(pd.notna(df), None).itertuples(index=False, name=None))
+
+        create_table_query = f"""
+        CREATE TABLE IF NOT EXISTS {table_name} (
+            {', '.join(SqliteUtils.infer_column_types(df, primary_key))}
+        );
+        """
+        insert_query = f"""
+        INSERT INTO {table_name} ({', '.join(df.columns)})
+        VALUES ({', '.join(['?'] * len(df.columns))})
+        """
+        cursor = connection.cursor()
+        try:
+            cursor.execute(create_table_query)
+
+            for start in range(0, len(rows), batch_size):
+                cursor.executemany(insert_query, rows[start:start + batch_size])
+
+            connection.commit()
+            return len(rows)
+        except sqlite3.Error:
+            connection.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def load_excel_to_sqlite(file_path, table_name, connection, batch_size=5000):
+        """
+        Loads data from an Excel file into a SQLite table.
+
+        Parameters:
+        file_path (str): The path to the Excel file.
+        table_name (str): The name of the table to create and insert data into.
+        connection: A SqliteConnection object.
+        batch_size (int): The number of rows sent per executemany call (default is 5000).
+
+        Returns:
+        None
+        """
+        df = pd.read_excel(file_path)
+
+        try:
+            count = SqliteUtils.load_dataframe_to_sqlite(df, table_name, connection, batch_size)
+            print("------")
+            print(f"{count} rows from {file_path} have been loaded into {table_name} table.")
+        except sqlite3.Error as e:
+            print("------")
+            print(f"The error '{e}' occurred while loading into table '{table_name}'")
+
+    @staticmethod
+    def stream_query(connection, query, batch_size=5000):
+        """
+        Runs a SELECT and yields its rows in batches.
+
+        Parameters:
+        connection: A SqliteConnection object.
+        query (str): The SELECT statement to run.
+        batch_size (int): The number of rows fetched per fetchmany call (default is 5000).
+
+        Yields:
+        list: Up to batch_size rows as dicts.
+        """
+        cursor = connection.cursor(dictionary=True)
+        try:
+            cursor.execute(query)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def delete_ids(cursor, table_name, id_column, ids, batch_size=1000):
+        """
+        Deletes rows by id, one prepared statement reused through executemany.
+
+        The id is the rowid, so every delete is a primary key lookup and no
+        large IN list has to be parsed.
+
+        Parameters:
+        cursor: A cursor of a SqliteConnection.
+        table_name (str): The table holding the rows.
+        id_column (str): The id column of the table.
+        ids (list): The ids to delete.
+        batch_size (int): The number of ids per executemany call (default is 1000).
+
+        Returns:
+        int: The number of rows deleted.
+        """
+        deleted_count = 0
+        ids = list(ids)
+        for start in range(0, len(ids), batch_size):
+            cursor.executemany(f"DELETE FROM {table_name} WHERE {id_column} = ?", [(doc_id,) for doc_id in ids[start:start + batch_size]])
+            deleted_count += cursor.rowcount
+        return deleted_count
+
+    @staticmethod
+    def mark_duplicates(cursor, table_name, id_column, duplicates, batch_size=1000):
+        """
+        Sets table_name.dup_of for duplicate rows instead of deleting them.
+
+        Parameters:
+        cursor: A cursor of a SqliteConnection.
+        table_name (str): The table holding the rows.
+        id_column (str): The id column of the table.
+        duplicates (dict): Maps each duplicate id to the id of its survivor.
+        batch_size (int): The number of rows sent per executemany call (default is 1000).
+
+        Returns:
+        int: The number of rows marked.
+        """
+        # the caller's cursor may return dict rows, read the schema as plain tuples
+        columns = cursor.connection.execute(f"PRAGMA table_info({table_name})").fetchall()
+        if 'dup_of' not in [column[1] for column in columns]:
+            cursor.execute(f"ALTER TABLE {table_name} ADD COLUMN dup_of INTEGER NULL")
+
+        cursor.execute("DROP TABLE IF EXISTS temp.dd_duplicates")
+        cursor.execute("CREATE TEMPORARY TABLE dd_duplicates (id INTEGER PRIMARY KEY, dup_of INTEGER NOT NULL)")
+        rows = list(duplicates.items())
+        for start in range(0, len(rows), batch_size):
+            cursor.executemany("INSERT INTO dd_duplicates (id, dup_of) VALUES (?, ?)", rows[start:start + batch_size])
+        cursor.execute(
+            f"UPDATE {table_name} SET dup_of = (SELECT d.dup_of FROM dd_duplicates d WHERE d.id = {table_name}.{id_column}) "
+            f"WHERE {id_column} IN (SELECT id FROM dd_duplicates)"
+        )
+        marked_count = cursor.rowcount
+        cursor.execute("DROP TABLE temp.dd_duplicates")
+        return marked_count
+
+    @staticmethod
+    def export_sqlite_to_excel(file_path, table_name, connection):
+        """
+        Exports data from a SQLite table to an Excel file.
+
+        Parameters:
+        file_path (str): The path to the Excel file to create.
+        table_name (str): The name of the table to export data from.
+        connection: A SqliteConnection object.
+
+        Returns:
+        None
+        """
+        try:
+            df = pd.read_sql(f"SELECT * FROM {table_name}", connection)
+
+            df.to_excel(file_path, index=False)
+            print("------")
+            print(f"Data from {table_name} table has been exported to {file_path}")
+        except (sqlite3.Error, pd.errors.DatabaseError) as e:
+            print("------")
+            print(f"The error '{e}' occurred while exporting data from table '{table_name}'")
+
+    @staticmethod
+    def show_table_structure(connection, table_name):
+        """
+        Displays the structure of a specified table in the database.
+
+        Parameters:
+        connection: A SqliteConnection object.
+        table_name (str): The name of the table whose structure is to be displayed.
+
+        Returns:
+        None
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(f"PRAGMA table_info({table_name})")
+            columns = cursor.fetchall()
+
+        fmt = "=== {:45} ==="
+        print("------")
+        print(f"Structure of table '{table_name}':")
+        for column in columns:
+            print(fmt.format(f"Column: {column[1]}, Type: {column[2]}"))
+
+    @staticmethod
+    def drop_table_if_exists(connection, table_name):
+        """
+        Drops a specified table if it exists in the database.
+
+        Parameters:
+        connection: A SqliteConnection object.
+        table_name (str): The name of the table to be dropped.
+
+        Returns:
+        None
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {table_name}")
+        connection.commit()
+        print("------")
+        print(f"Table '{table_name}' has been dropped if it existed.")
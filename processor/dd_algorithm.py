@@ -1,14 +1,22 @@
 import jieba
 import re
+import math
+from functools import partial
+from multiprocessing import Pool
 import hashlib
+import numpy as np
+import xxhash
+import ahocorasick
+from scipy.sparse import csr_matrix
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from datasketch import MinHash, MinHashLSH
 
 from .dd_strategy import SimilarityStrategy
-import time
+from .dd_index import SimhashIndex, MinHashIndex, SpilledMinHashIndex
+from .dd_distributed import MinHashBands, SimhashBands
+from .dd_tfidf_model import TfidfModel
 
 stopwords = {'的', '了', '和', '是', '在', '就', '不', '有', '也', '都', '上', '你', '我'}
+punctuation = re.compile(r'[^\w\s]')
 
 class ProcessTools:
     @staticmethod
@@ -18,7 +26,7 @@ class ProcessTools:
     @staticmethod
     def chinese_tokenizer(tokens, type=None):
         tokens = jieba.lcut(tokens)
-        tokens = [re.sub(r'[^\w\s]', '', token) for token in tokens]
+        tokens = [punctuation.sub('', token) for token in tokens]
         # tokens = [token for token in tokens if token not in self.stopwords]
         
         if type == 'list':
@@ -26,24 +34,136 @@ class ProcessTools:
         else:
             return ' '.join(tokens)
     
+    @staticmethod
+    def char_shingles(text, k=2, type=None):
+        """
+        Splits text into overlapping character k-shingles, skipping jieba entirely.
+
+        Punctuation and whitespace are removed first, so '工银投资' and
+        '工银于近日投资' still share the '工银' and '投资' shingles. Texts shorter
+        than k give a single shingle.
+        """
+        text = ProcessTools.normalize_text(text)
+        shingles = [text[i:i + k] for i in range(max(len(text) - k + 1, 1))] if text else []
+        if type == 'list':
+            return shingles
+        else:
+            return ' '.join(shingles)
+
+    @staticmethod
+    def tokenize_chunk(texts, type=None, tokenizer='jieba', shingle_k=2):
+        if tokenizer == 'char':
+            return [ProcessTools.char_shingles(text, shingle_k, type=type) for text in texts]
+        return [ProcessTools.chinese_tokenizer(text, type=type) for text in texts]
+
+    @staticmethod
+    def tokenizer_params(tokenizer='jieba', shingle_k=2):
+        if tokenizer == 'char':
+            return f'char:{shingle_k}'
+        if tokenizer == 'jieba':
+            return 'jieba'
+        raise ValueError(f"Unknown tokenizer '{tokenizer}', expected 'jieba' or 'char'")
+
+    @staticmethod
+    def create_pool(workers):
+        if workers <= 1:
+            return None
+        return Pool(processes=workers, initializer=jieba.initialize)
+
+    @staticmethod
+    def tokenize_batch(texts, type=None, workers=1, chunk_size=1000, cache=None, pool=None, tokenizer='jieba', shingle_k=2):
+        """
+        Runs chinese_tokenizer (or char_shingles when tokenizer='char') over texts,
+        in a process pool when workers > 1.
+
+        Texts are dispatched in chunks of chunk_size and results come back in input
+        order. Each worker loads the jieba dictionary once in its initializer.
+        With a DdCache, only texts missing from the cache are tokenized. Callers
+        tokenizing many batches can pass a pool from create_pool to reuse it.
+        """
+        texts = list(texts)
+        if cache is not None:
+            return cache.get_or_compute(
+                f'tokens:{type}', ProcessTools.tokenizer_params(tokenizer, shingle_k), texts,
+                lambda missing: ProcessTools.tokenize_batch(
+                    [texts[i] for i in missing], type, workers, chunk_size, pool=pool, tokenizer=tokenizer, shingle_k=shingle_k
+                )
+            )
+        if (pool is None and workers <= 1) or len(texts) <= chunk_size:
+            return ProcessTools.tokenize_chunk(texts, type=type, tokenizer=tokenizer, shingle_k=shingle_k)
+        
+        chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+        tokenized = []
+        own_pool = pool is None
+        if own_pool:
+            pool = ProcessTools.create_pool(workers)
+        try:
+            for chunk in pool.imap(partial(ProcessTools.tokenize_chunk, type=type, tokenizer=tokenizer, shingle_k=shingle_k), chunks):
+                tokenized.extend(chunk)
+        finally:
+            if own_pool:
+                pool.terminate()
+        return tokenized
+    
+    @staticmethod
+    def normalize_text(text):
+        return ''.join(punctuation.sub('', text or '').split()).lower()
+
+    @staticmethod
+    def find_contained_pairs(ids, texts):
+        """
+        Finds exact duplicates and texts contained in other texts, after normalize_text.
+
+        Exact duplicates are grouped by their normalized text and chained to the
+        group's first row. One Aho-Corasick automaton over the distinct texts then
+        reports, in a single pass per text, every other text it contains, so the
+        cost is linear in corpus size plus the number of matches. Each pair is
+        ordered by position, earlier row as id1.
+        """
+        groups = {}
+        for position, text in enumerate(texts):
+            normalized = ProcessTools.normalize_text(text)
+            if normalized:
+                groups.setdefault(normalized, []).append(position)
+        
+        pairs = []
+        for positions in groups.values():
+            for position in positions[1:]:
+                pairs.append((positions[0], position))
+        
+        if groups:
+            automaton = ahocorasick.Automaton()
+            for normalized, positions in groups.items():
+                automaton.add_word(normalized, positions[0])
+            automaton.make_automaton()
+            
+            for normalized, positions in groups.items():
+                outer = positions[0]
+                found = set()
+                for _, inner in automaton.iter(normalized):
+                    if inner != outer and inner not in found:
+                        found.add(inner)
+                        pairs.append((min(inner, outer), max(inner, outer)))
+        
+        return [{'id1': ids[i], 'id2': ids[j]} for i, j in pairs]
+
     @staticmethod
     def remove_sub_string(articles, column_name, ids, similar_pairs):
-        for i in range(len(ids)):
-                for j in range(i + 1, len(ids)):
-                    if articles[i][column_name] in articles[j][column_name]:
-                        similar_pairs.append({
-                            'id1': ids[i],
-                            'id2': ids[j],
-                            # 'text1': articles[i][column_name],
-                            # 'text2': articles[j][column_name]
-                        })
-        print(f"Found {len(similar_pairs)} similar records by substring.")
+        found = ProcessTools.find_contained_pairs(ids, [article[column_name] for article in articles])
+        similar_pairs.extend(found)
+        print(f"Found {len(found)} similar records by substring.")
     
     @staticmethod
     def remove_similar_pairs():
         pass
 
 class Simhash:
+    # token hash functions for simhash_128_batch, each returning a 128-bit int
+    HASH_FUNCS = {
+        'md5': lambda token: int(hashlib.md5(token.encode('utf-8')).hexdigest(), 16),
+        'xxh3': lambda token: xxhash.xxh3_128_intdigest(token.encode('utf-8')),
+    }
+
     @staticmethod
     def simhash_128(text):
         words = ProcessTools.chinese_tokenizer(text, type='list')
@@ -66,13 +186,165 @@ class Simhash:
         
         return fingerprint
 
+    @staticmethod
+    def simhash_128_batch(token_lists, hash_func='xxh3', chunk_size=10000):
+        """
+        Fingerprints many token lists at once.
+
+        Every distinct token is hashed once, its bits are unpacked into a 0/1 matrix
+        and the per-document bit votes are a sparse count matrix product, replacing
+        the 128-step Python loop per token. With hash_func='md5' the result is
+        identical to simhash_128 for the same tokens.
+
+        Returns an (n, 2) uint64 array holding the low and high 64 bits of each fingerprint.
+        """
+        hash_token = Simhash.HASH_FUNCS[hash_func]
+        mask = (1 << 64) - 1
+        vocabulary = {}
+        token_hashes = []
+        indptr = [0]
+        indices = []
+        for tokens in token_lists:
+            for token in tokens:
+                col = vocabulary.get(token)
+                if col is None:
+                    col = vocabulary[token] = len(token_hashes)
+                    value = hash_token(token)
+                    token_hashes.append((value & mask, value >> 64))
+                indices.append(col)
+            indptr.append(len(indices))
+
+        n = len(indptr) - 1
+        hashes = np.array(token_hashes, dtype='<u8').reshape(-1, 2)
+        # column i of token_bits is bit i of the 128-bit hash
+        token_bits = np.unpackbits(hashes.view(np.uint8), axis=1, bitorder='little').astype(np.int32)
+        counts = csr_matrix(
+            (np.ones(len(indices), dtype=np.int32), np.array(indices, dtype=np.int64), np.array(indptr, dtype=np.int64)),
+            shape=(n, len(token_hashes)),
+        )
+        lengths = np.diff(counts.indptr)
+
+        fingerprints = np.empty((n, 2), dtype=np.uint64)
+        for start in range(0, n, chunk_size):
+            end = min(start + chunk_size, n)
+            ones = counts[start:end] @ token_bits
+            # ones - zeros >= 0, same tie rule as simhash_128
+            bits = (2 * np.asarray(ones) - lengths[start:end, None]) >= 0
+            packed = np.packbits(bits, axis=1, bitorder='little')
+            fingerprints[start:end] = packed.view('<u8')
+        return fingerprints
+
+    @staticmethod
+    def to_int(fingerprint):
+        return int(fingerprint[0]) | (int(fingerprint[1]) << 64)
+
     @staticmethod
     def hamming_distance_similarity(simhash1, simhash2):
         hamming_distance = bin(simhash1 ^ simhash2).count('1')
         similarity = 1 - hamming_distance / 128
         return similarity
 
+    @staticmethod
+    def max_distance(threshold, hash_bits=128):
+        # largest d with 1 - d / hash_bits > threshold, matching hamming_distance_similarity
+        return max(math.ceil(round((1 - threshold) * hash_bits, 9)) - 1, 0)
+
+class Minhash:
+    MAX_HASH = 0xFFFFFFFF
+
+    @staticmethod
+    def permutations(num_perm=128, seed=1):
+        # multiply-shift hashing: an odd 64-bit a and a 64-bit b per permutation
+        gen = np.random.RandomState(seed)
+        a = gen.randint(0, 1 << 63, num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        b = gen.randint(0, 1 << 64, num_perm, dtype=np.uint64)
+        return a, b
+
+    @staticmethod
+    def signatures_batch(token_lists, permutations, chunk_size=2000):
+        """
+        Computes MinHash signatures for many token lists at once.
+
+        Every distinct token is hashed once with xxh3_64. For each chunk of documents
+        the token hashes go through all permutations as one (tokens, num_perm)
+        NumPy product, and np.minimum.reduceat takes the per-document minimum.
+
+        Returns an (n, num_perm) uint32 array; documents without tokens keep MAX_HASH.
+        """
+        a, b = permutations
+        vocabulary = {}
+        token_hashes = []
+        indptr = [0]
+        indices = []
+        for tokens in token_lists:
+            for token in tokens:
+                col = vocabulary.get(token)
+                if col is None:
+                    col = vocabulary[token] = len(token_hashes)
+                    token_hashes.append(xxhash.xxh3_64_intdigest(token.encode('utf-8')))
+                indices.append(col)
+            indptr.append(len(indices))
+
+        hashes = np.array(token_hashes, dtype=np.uint64)
+        indices = np.array(indices, dtype=np.int64)
+        indptr = np.array(indptr, dtype=np.int64)
+        n = len(indptr) - 1
+
+        signatures = np.full((n, len(a)), Minhash.MAX_HASH, dtype=np.uint32)
+        for start in range(0, n, chunk_size):
+            end = min(start + chunk_size, n)
+            lo, hi = indptr[start], indptr[end]
+            if lo == hi:
+                continue
+            # uint64 arithmetic wraps, giving (a * h + b) mod 2^64; the top 32 bits are the hash
+            permuted = ((hashes[indices[lo:hi], None] * a + b) >> np.uint64(32)).astype(np.uint32)
+            nonempty = indptr[start + 1:end + 1] > indptr[start:end]
+            offsets = indptr[start:end][nonempty] - lo
+            signatures[start:end][nonempty] = np.minimum.reduceat(permuted, offsets, axis=0)
+        return signatures
+
 class TfidfSimilarity(SimilarityStrategy):
+    def __init__(self, block_size=2048, top_k=None, model_path=None, workers=1, cache=None, tokenizer='jieba', shingle_k=2, report=None):
+        super().__init__(workers, cache, tokenizer, shingle_k, report)
+        self.block_size = block_size
+        self.top_k = top_k
+        # a TfidfModel fitted on a reference corpus, empty fits the vocabulary on every run
+        self.model_path = model_path
+        self.model = None
+
+    @staticmethod
+    def sparse_cosine_pairs(matrix, threshold, block_size=2048, top_k=None):
+        """
+        Yields (i, j) row pairs with i < j whose cosine similarity is above threshold.
+
+        Rows must be L2-normalized (TfidfVectorizer's default), so a block of the
+        similarity matrix is just a sparse block @ matrix.T product; only one
+        block_size x n sparse slice is alive at a time. With top_k, each row
+        keeps only its top_k most similar rows above the threshold.
+        """
+        matrix = csr_matrix(matrix)
+        transposed = matrix.T.tocsr()
+        for start in range(0, matrix.shape[0], block_size):
+            block = (matrix[start:start + block_size] @ transposed).tocoo()
+            rows = block.row + start
+            cols = block.col
+            keep = (block.data > threshold) & (rows != cols)
+            if top_k is None:
+                keep &= cols > rows
+            rows, cols, data = rows[keep], cols[keep], block.data[keep]
+
+            if top_k is not None:
+                order = np.lexsort((-data, rows))
+                rows, cols = rows[order], cols[order]
+                # rank of each entry within its row, entries already sorted by score
+                first = np.searchsorted(rows, rows, side='left')
+                ranked = np.arange(len(rows)) - first < top_k
+                rows, cols = rows[ranked], cols[ranked]
+                # a pair kept from the j side is reported again as (i, j)
+                rows, cols = np.minimum(rows, cols), np.maximum(rows, cols)
+
+            yield from zip(rows.tolist(), cols.tolist())
+
     def find_similar_pairs(self, articles, column_name, threshold, id, sub_string = True):
         ids = [article[f'{id}'] for article in articles]
         
@@ -80,30 +352,79 @@ class TfidfSimilarity(SimilarityStrategy):
         
         # TODO: repeate
         if sub_string:
-            ProcessTools.remove_sub_string(articles, column_name, ids, similar_pairs)
+            with self.report.stage('substring', len(ids)) as record:
+                ProcessTools.remove_sub_string(articles, column_name, ids, similar_pairs)
+                record['pairs'] = len(similar_pairs)
             
-        texts = [ProcessTools.chinese_tokenizer(article[column_name]) for article in articles]
         # calculate TF-IDF matrix
-        vectorizer = TfidfVectorizer()
-        tfidf_matrix = vectorizer.fit_transform(texts)
-        
-        cosine_sim_matrix = cosine_similarity(tfidf_matrix) 
+        with self.report.stage('tokenize', len(ids)):
+            texts = self.prepare_texts([article[column_name] for article in articles])
+        with self.report.stage('hash', len(ids)) as record:
+            if self.model_path:
+                model = self.load_model()
+                tfidf_matrix = model.transform(texts)
+                record['model'] = model.version
+            elif self.tokenizer == 'char':
+                tfidf_matrix = TfidfVectorizer(analyzer='char_wb', ngram_range=(self.shingle_k, self.shingle_k)).fit_transform(texts)
+            else:
+                tfidf_matrix = TfidfVectorizer().fit_transform(texts)
+            record['features'] = tfidf_matrix.shape[1]
         
         print("your threshold is: ", threshold)
-        for i in range(len(ids)):
-            for j in range(i + 1, len(ids)):
-                sim_val = cosine_sim_matrix[i, j]
-                if sim_val > threshold:
-                    similar_pairs.append({
-                        'id1': ids[i],
-                        'id2': ids[j],
-                        # 'text1': articles[i][column_name],
-                        # 'text2': articles[j][column_name]
-                    })
+        with self.report.stage('query', len(ids)) as record:
+            seen = set()
+            for i, j in TfidfSimilarity.sparse_cosine_pairs(tfidf_matrix, threshold, self.block_size, self.top_k):
+                if (i, j) in seen:
+                    continue
+                seen.add((i, j))
+                similar_pairs.append({
+                    'id1': ids[i],
+                    'id2': ids[j],
+                    # 'text1': articles[i][column_name],
+                    # 'text2': articles[j][column_name]
+                })
+            record['pairs'] = len(seen)
         
         return similar_pairs
 
+    def prepare_texts(self, raw_texts):
+        if self.tokenizer == 'char':
+            # sklearn builds the character n-grams itself, no tokenizing pass needed
+            return [ProcessTools.normalize_text(text) for text in raw_texts]
+        return ProcessTools.tokenize_batch(raw_texts, workers=self.workers, cache=self.cache, pool=self.pool)
+
+    def load_model(self):
+        if self.model is None:
+            model = TfidfModel.load(self.model_path)
+            if (model.tokenizer, model.shingle_k) != (self.tokenizer, self.shingle_k):
+                raise ValueError(
+                    f"TF-IDF model at {self.model_path} was fitted with tokenizer={model.tokenizer}, shingle_k={model.shingle_k}; "
+                    f"refit it or use the same tokenizer"
+                )
+            print(f"Using TF-IDF model {model.version} fitted on {model.documents} documents")
+            self.model = model
+        return self.model
+
+    def fit_model(self, raw_texts, path, stopwords=None, term_weights=None, hashing=False, n_features=2 ** 20):
+        """
+        Fits a TfidfModel on a reference corpus, tokenized like the texts it will score, and saves it to path.
+        """
+        model = TfidfModel(self.tokenizer, self.shingle_k, stopwords, term_weights, hashing, n_features)
+        model.fit(self.prepare_texts(raw_texts))
+        model.save(path)
+        self.model_path = path
+        self.model = model
+        return model
+
 class SimhashSimilarity(SimilarityStrategy):
+    def __init__(self, hash_func='xxh3', blocks=None, workers=1, cache=None, tokenizer='jieba', shingle_k=2, report=None):
+        super().__init__(workers, cache, tokenizer, shingle_k, report)
+        self.hash_func = hash_func
+        # None splits fingerprints into max_distance + 1 blocks, which finds every pair
+        self.blocks = blocks
+        self.fingerprint_params = f"{ProcessTools.tokenizer_params(tokenizer, shingle_k)},{hash_func}"
+        self.index_params = self.fingerprint_params + (f",blocks={blocks}" if blocks else "")
+
     def find_similar_pairs(self, articles, column_name, threshold, id, sub_string = True):
         ids = [article[f'{id}'] for article in articles]
         
@@ -111,25 +432,116 @@ class SimhashSimilarity(SimilarityStrategy):
         
         # TODO: repeate
         if sub_string:
-            ProcessTools.remove_sub_string(articles, column_name, ids, similar_pairs)
+            with self.report.stage('substring', len(ids)) as record:
+                ProcessTools.remove_sub_string(articles, column_name, ids, similar_pairs)
+                record['pairs'] = len(similar_pairs)
         
-        simhash_values = [Simhash.simhash_128(article[column_name]) for article in articles]
+        simhash_values = self.fingerprints([article[column_name] for article in articles])
         
         print("your threshold is: ", threshold)
-        for i in range(len(ids)):
-            for j in range(i + 1, len(ids)):
-                sim_val = Simhash.hamming_distance_similarity(simhash_values[i], simhash_values[j])
-                if sim_val > threshold:
+        self.index = self.create_index(threshold)
+        # each row is queried against the rows before it, then indexed
+        with self.report.stage('query', len(ids)) as record:
+            found = len(similar_pairs)
+            for i in range(len(ids)):
+                for j in self.index.query(simhash_values[i]):
                     similar_pairs.append({
-                        'id1': ids[i],
-                        'id2': ids[j],
-                        # 'text1': articles[i][column_name],
-                        # 'text2': articles[j][column_name]
+                        'id1': j,
+                        'id2': ids[i],
+                        # 'text1': articles[j][column_name],
+                        # 'text2': articles[i][column_name]
                     })
+                self.index.add(ids[i], simhash_values[i])
+            record['candidates'] = self.index.candidate_count
+            record['pairs'] = len(similar_pairs) - found
+        
+        return similar_pairs
+
+    @staticmethod
+    def compute_fingerprints(texts, hash_func='xxh3', tokenizer='jieba', shingle_k=2):
+        token_lists = ProcessTools.tokenize_chunk(texts, type='list', tokenizer=tokenizer, shingle_k=shingle_k)
+        return [Simhash.to_int(fp) for fp in Simhash.simhash_128_batch(token_lists, hash_func=hash_func)]
+
+    def batch_features(self):
+        return partial(SimhashSimilarity.compute_fingerprints, hash_func=self.hash_func, tokenizer=self.tokenizer, shingle_k=self.shingle_k)
+
+    def index_batch(self, index, ids, fingerprints, similar_pairs):
+        for doc_id, fingerprint in zip(ids, fingerprints):
+            for j in index.query(fingerprint):
+                similar_pairs.append({'id1': j, 'id2': doc_id})
+            index.add(doc_id, fingerprint)
+
+    def fingerprints(self, raw_texts):
+        def fingerprint(indices):
+            with self.report.stage('tokenize', len(indices)):
+                texts = ProcessTools.tokenize_batch([raw_texts[i] for i in indices], type='list', workers=self.workers, cache=self.cache, pool=self.pool, tokenizer=self.tokenizer, shingle_k=self.shingle_k)
+            with self.report.stage('hash', len(indices)):
+                return [Simhash.to_int(fp) for fp in Simhash.simhash_128_batch(texts, hash_func=self.hash_func)]
+        
+        if self.cache is not None:
+            return self.cache.get_or_compute(*self.feature_cache_key(), raw_texts, fingerprint)
+        return fingerprint(range(len(raw_texts)))
+
+    def feature_cache_key(self):
+        return 'simhash', self.fingerprint_params
+
+    def create_index(self, threshold):
+        return SimhashIndex(Simhash.max_distance(threshold), blocks=self.blocks)
+
+    def distributed_bands(self, threshold):
+        return SimhashBands(self.create_index(threshold))
+
+    def find_similar_pairs_streaming(self, batches, column_name, threshold, id = 'id'):
+        index = self.create_index(threshold)
+        similar_pairs = []
+        self.pool = ProcessTools.create_pool(self.workers)
+        try:
+            for batch in batches:
+                ids = [article[f'{id}'] for article in batch]
+                self.index_batch(index, ids, self.fingerprints([article[column_name] for article in batch]), similar_pairs)
+        finally:
+            if self.pool is not None:
+                self.pool.terminate()
+                self.pool = None
+        self.index = index
+        return similar_pairs
+
+    def find_new_pairs(self, index, articles, column_name, id):
+        ids = [article[f'{id}'] for article in articles]
+        simhash_values = self.fingerprints([article[column_name] for article in articles])
+        
+        similar_pairs = []
+        with self.report.stage('query', len(ids)) as record:
+            # the persisted index counts candidates across runs
+            candidates = index.candidate_count
+            for i in range(len(ids)):
+                matches = index.query(simhash_values[i])
+                for j in matches:
+                    similar_pairs.append({'id1': j, 'id2': ids[i]})
+                # duplicates are deleted, so only survivors join the index
+                if not matches:
+                    index.add(ids[i], simhash_values[i])
+            record['candidates'] = index.candidate_count - candidates
+            record['pairs'] = len(similar_pairs)
         
         return similar_pairs
     
 class MinHashSimilarity(SimilarityStrategy):
+    def __init__(self, num_perm=128, seed=1, bands=None, rows=None, weights=(0.5, 0.5), verify=True, spill_directory=None, spill_rows=1000000, workers=1, cache=None, tokenizer='jieba', shingle_k=2, report=None):
+        super().__init__(workers, cache, tokenizer, shingle_k, report)
+        self.num_perm = num_perm
+        self.seed = seed
+        self.bands = bands
+        self.rows = rows
+        self.weights = weights
+        self.verify = verify
+        # streaming and pipelined modes spill the lsh to this directory instead of keeping it in memory
+        self.spill_directory = spill_directory
+        self.spill_rows = spill_rows
+        self.permutations = Minhash.permutations(num_perm, seed)
+        self.signature_params = f"{ProcessTools.tokenizer_params(tokenizer, shingle_k)},xxh3_64,num_perm={num_perm},seed={seed}"
+        self.index_params = f"{self.signature_params},bands={bands},rows={rows},weights={tuple(weights)},verify={verify}"
+
     def find_similar_pairs(self, articles, column_name, threshold, id, sub_string = True):
         ids = [article[f'{id}'] for article in articles]
         
@@ -137,35 +549,239 @@ class MinHashSimilarity(SimilarityStrategy):
         
         # TODO: repeate
         if sub_string:
-            ProcessTools.remove_sub_string(articles, column_name, ids, similar_pairs)
+            with self.report.stage('substring', len(ids)) as record:
+                ProcessTools.remove_sub_string(articles, column_name, ids, similar_pairs)
+                record['pairs'] = len(similar_pairs)
             
         # minhash
-        texts = [ProcessTools.chinese_tokenizer(article[column_name], type='list') for article in articles]
+        lsh = self.create_index(threshold)
+        print(f"your threshold is: {threshold}, lsh bands: {lsh.bands}, rows: {lsh.rows}")
         
-        lsh = MinHashLSH(num_perm=128, threshold = threshold)
-        minhashes = {}
+        signatures = self.signatures([article[column_name] for article in articles])
+        with self.report.stage('index', len(ids)):
+            lsh.insert_many(ids, signatures)
+
+        # verification of the lsh candidates happens inside lsh.query
+        with self.report.stage('query', len(ids)) as record:
+            found = len(similar_pairs)
+            positions = {doc_id: i for i, doc_id in enumerate(ids)}
+            for i in range(len(ids)):
+                result = lsh.query(signatures[i])
+                # every match is found from both sides, report it once from the later row
+                for j in sorted(positions[doc_id] for doc_id in result):
+                    if j < i:
+                        similar_pairs.append({
+                            'id1': ids[j],
+                            'id2': ids[i],
+                            # 'text1': articles[j][column_name],
+                            # 'text2': articles[i][column_name]
+                        })
+            record['candidates'] = lsh.candidate_count
+            record['pairs'] = len(similar_pairs) - found
         
-        start_time = time.time()
-        # TODO: O(n)
-        for i, tokens in enumerate(texts):
-            minhash = MinHash(num_perm=128)
-            for token in tokens:
-                minhash.update(token.encode('utf8'))
-            lsh.insert(ids[i], minhash)
-            minhashes[ids[i]] = minhash
-        print(f"time to hash: {time.time() - start_time}")
-
-        start_time = time.time()
-        for i in range(len(ids)):
-            result = lsh.query(minhashes[ids[i]])
-            for j in result:
-                if ids[i] != j:
-                    similar_pairs.append({
-                        'id1': ids[i],
-                        'id2': j,
-                        # 'text1': articles[i][column_name],
-                        # 'text2': next(article[column_name] for article in articles if article['id'] == j)
-                    })
-        print(f"time to query: {time.time() - start_time}")  
+        return similar_pairs
+
+    @staticmethod
+    def compute_signatures(texts, permutations, tokenizer='jieba', shingle_k=2):
+        token_lists = ProcessTools.tokenize_chunk(texts, type='list', tokenizer=tokenizer, shingle_k=shingle_k)
+        return Minhash.signatures_batch(token_lists, permutations)
+
+    def batch_features(self):
+        return partial(MinHashSimilarity.compute_signatures, permutations=self.permutations, tokenizer=self.tokenizer, shingle_k=self.shingle_k)
+
+    def index_batch(self, index, ids, signatures, similar_pairs):
+        if isinstance(index, SpilledMinHashIndex):
+            # its pairs are merged from the spilled buckets in finish_index
+            index.insert_many(ids, signatures)
+            return
+        for doc_id, signature in zip(ids, signatures):
+            for j in index.query(signature):
+                similar_pairs.append({'id1': j, 'id2': doc_id})
+            index.insert(doc_id, signature)
+
+    def signatures(self, raw_texts):
+        def signature(indices):
+            with self.report.stage('tokenize', len(indices)):
+                texts = ProcessTools.tokenize_batch([raw_texts[i] for i in indices], type='list', workers=self.workers, cache=self.cache, pool=self.pool, tokenizer=self.tokenizer, shingle_k=self.shingle_k)
+            with self.report.stage('hash', len(indices)):
+                return Minhash.signatures_batch(texts, self.permutations)
         
-        return similar_pairs
\ No newline at end of file
+        if self.cache is None:
+            return signature(range(len(raw_texts)))
+        rows = self.cache.get_or_compute(*self.feature_cache_key(), raw_texts, signature)
+        return np.array(rows, dtype=np.uint32).reshape(len(rows), self.num_perm)
+
+    def feature_cache_key(self):
+        return 'minhash', self.signature_params
+
+    def create_index(self, threshold):
+        return MinHashIndex(
+            threshold, num_perm=self.num_perm, seed=self.seed,
+            bands=self.bands, rows=self.rows, weights=self.weights, verify=self.verify
+        )
+
+    def distributed_bands(self, threshold):
+        return MinHashBands(self.create_index(threshold))
+
+    def create_stream_index(self, threshold):
+        if self.spill_directory is None:
+            return self.create_index(threshold)
+        return SpilledMinHashIndex(
+            self.spill_directory, threshold, num_perm=self.num_perm,
+            bands=self.bands, rows=self.rows, weights=self.weights, verify=self.verify, spill_rows=self.spill_rows
+        )
+
+    def finish_index(self, index, similar_pairs):
+        if not isinstance(index, SpilledMinHashIndex):
+            return
+        with self.report.stage('query', len(index)) as record:
+            found = len(similar_pairs)
+            try:
+                for id1, id2 in index.pairs():
+                    similar_pairs.append({'id1': id1, 'id2': id2})
+            finally:
+                index.close()
+            record['candidates'] = index.candidate_count
+            record['pairs'] = len(similar_pairs) - found
+
+    def find_similar_pairs_streaming(self, batches, column_name, threshold, id = 'id'):
+        lsh = self.create_stream_index(threshold)
+        similar_pairs = []
+        self.pool = ProcessTools.create_pool(self.workers)
+        try:
+            for batch in batches:
+                ids = [article[f'{id}'] for article in batch]
+                self.index_batch(lsh, ids, self.signatures([article[column_name] for article in batch]), similar_pairs)
+            self.finish_index(lsh, similar_pairs)
+        finally:
+            if self.pool is not None:
+                self.pool.terminate()
+                self.pool = None
+            if isinstance(lsh, SpilledMinHashIndex):
+                lsh.close()
+        return similar_pairs
+
+    def find_new_pairs(self, index, articles, column_name, id):
+        ids = [article[f'{id}'] for article in articles]
+        signatures = self.signatures([article[column_name] for article in articles])
+        
+        similar_pairs = []
+        with self.report.stage('query', len(ids)) as record:
+            # the persisted index counts candidates across runs
+            candidates = index.candidate_count
+            for i, signature in enumerate(signatures):
+                matches = index.query(signature)
+                for j in matches:
+                    similar_pairs.append({'id1': j, 'id2': ids[i]})
+                # duplicates are deleted, so only survivors join the index
+                if not matches:
+                    index.insert(ids[i], signature)
+            record['candidates'] = index.candidate_count - candidates
+            record['pairs'] = len(similar_pairs)
+        
+        return similar_pairs
+
+class MultiFieldSimilarity(SimilarityStrategy):
+    """
+    Weighted dedup over several columns, passed to find_similar_pairs as a {field: weight} map.
+
+    The first field is the blocking field: its MinHash LSH proposes candidate
+    pairs, without verifying them, and gives their estimated Jaccard similarity.
+    blocking_threshold defaults to the lowest blocking similarity that can still
+    pass when every other field is identical, (threshold - other weights) /
+    blocking weight, so the blocker never drops a pair the weights would keep. Every other field is compared by SimHash, fingerprinting
+    only rows that appear in a candidate pair; a Hamming distance d scores
+    max(0, 1 - 2d / 128), so unrelated texts (about 64 differing bits) score 0
+    as their Jaccard similarity would. A pair is similar when the weighted
+    mean of the field similarities is above the threshold. Blocking fields
+    contained in one another count as a blocking similarity of 1, they do not
+    make a pair similar on their own.
+    """
+
+    # below this the LSH bands get so short that almost every pair is a candidate
+    MIN_BLOCKING_THRESHOLD = 0.1
+
+    def __init__(self, blocking_threshold=None, num_perm=128, seed=1, hash_func='xxh3', workers=1, cache=None, tokenizer='jieba', shingle_k=2, report=None):
+        super().__init__(workers, cache, tokenizer, shingle_k, report)
+        self.blocking_threshold = blocking_threshold
+        self.blocking = MinHashSimilarity(num_perm=num_perm, seed=seed, workers=workers, cache=cache, tokenizer=tokenizer, shingle_k=shingle_k, report=report)
+        self.content = SimhashSimilarity(hash_func=hash_func, workers=workers, cache=cache, tokenizer=tokenizer, shingle_k=shingle_k, report=report)
+
+    @staticmethod
+    def normalize_weights(fields):
+        if isinstance(fields, str):
+            return {fields: 1.0}
+        total = sum(fields.values())
+        if total <= 0:
+            raise ValueError("Field weights must sum to a positive number")
+        return {field: weight / total for field, weight in fields.items()}
+
+    def default_blocking_threshold(self, weights, blocking_field, threshold):
+        others = sum(weight for field, weight in weights.items() if field != blocking_field)
+        return max((threshold - others) / weights[blocking_field], MultiFieldSimilarity.MIN_BLOCKING_THRESHOLD)
+
+    def find_similar_pairs(self, articles, column_name, threshold, id, sub_string = True):
+        weights = MultiFieldSimilarity.normalize_weights(column_name)
+        blocking_field = next(iter(weights))
+        ids = [article[f'{id}'] for article in articles]
+        
+        similar_pairs = []
+        positions = {doc_id: i for i, doc_id in enumerate(ids)}
+        # (earlier, later) position pairs to score, True when their blocking fields are contained in one another
+        candidates = {}
+        
+        if sub_string:
+            with self.report.stage('substring', len(ids)) as record:
+                contained = []
+                ProcessTools.remove_sub_string(articles, blocking_field, ids, contained)
+                for pair in contained:
+                    i, j = sorted((positions[pair['id1']], positions[pair['id2']]))
+                    candidates[(i, j)] = True
+                record['pairs'] = len(candidates)
+        
+        # blocking: candidates come only from the blocking field's lsh buckets
+        blocking_threshold = self.blocking_threshold
+        if blocking_threshold is None:
+            blocking_threshold = self.default_blocking_threshold(weights, blocking_field, threshold)
+        signatures = self.blocking.signatures([article[blocking_field] for article in articles])
+        # the weighted score decides, the blocker only proposes candidates
+        index = MinHashIndex(blocking_threshold, num_perm=self.blocking.num_perm, seed=self.blocking.seed, verify=False)
+        with self.report.stage('index', len(ids)):
+            index.insert_many(ids, signatures)
+        
+        with self.report.stage('query', len(ids)) as record:
+            for i in range(len(ids)):
+                for j in index.query(signatures[i]):
+                    j = positions[j]
+                    if j < i:
+                        candidates.setdefault((j, i), False)
+            record['candidates'] = index.candidate_count
+            record['pairs'] = len(candidates)
+        print(f"your threshold is: {threshold}, {len(candidates)} candidate pairs from '{blocking_field}'")
+        if not candidates:
+            return similar_pairs
+        
+        with self.report.stage('verify', len(candidates)) as record:
+            found = len(similar_pairs)
+            left = np.array([i for i, _ in candidates])
+            right = np.array([j for _, j in candidates])
+            estimates = (signatures[left] == signatures[right]).mean(axis=1)
+            scores = weights[blocking_field] * np.where(list(candidates.values()), 1.0, estimates)
+            
+            involved = sorted(set(left.tolist()) | set(right.tolist()))
+            slot = {position: k for k, position in enumerate(involved)}
+            for field, weight in weights.items():
+                if field == blocking_field:
+                    continue
+                fingerprints = self.content.fingerprints([articles[position][field] for position in involved])
+                distances = np.array([
+                    bin(fingerprints[slot[i]] ^ fingerprints[slot[j]]).count('1') for i, j in candidates
+                ])
+                scores += weight * np.maximum(0, 1 - 2 * distances / 128)
+            
+            for (i, j), score in zip(candidates, scores):
+                if score > threshold:
+                    similar_pairs.append({'id1': ids[i], 'id2': ids[j]})
+            record['pairs'] = len(similar_pairs) - found
+        
+        return similar_pairs
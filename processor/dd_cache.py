@@ -0,0 +1,130 @@
+import os
+import pickle
+import sqlite3
+import hashlib
+import itertools
+import threading
+
+
+class DdCache:
+    """
+    On-disk SQLite cache for per-text results (tokens, simhash fingerprints, minhash signatures).
+
+    Entries are keyed by a hash of the kind of result, the parameters that produced
+    it and the text itself, so changing the tokenizer or algorithm settings never
+    returns a stale value. The least recently used entries are evicted once the
+    cache holds more than max_entries rows.
+
+    The connection may be used from several threads (the pipeline looks texts
+    up in a scheduler thread), one statement batch at a time.
+    """
+
+    BATCH_SIZE = 500
+
+    def __init__(self, path, max_entries=1_000_000):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("""
+        CREATE TABLE IF NOT EXISTS dd_cache (
+            key TEXT PRIMARY KEY,
+            value BLOB NOT NULL,
+            last_used INTEGER NOT NULL
+        )
+        """)
+        self.connection.execute("CREATE INDEX IF NOT EXISTS dd_cache_last_used ON dd_cache (last_used)")
+        self.connection.commit()
+        row = self.connection.execute("SELECT MAX(last_used) FROM dd_cache").fetchone()
+        self.clock = itertools.count((row[0] or 0) + 1)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(kind, params, text):
+        return hashlib.blake2b(f"{kind}\0{params}\0{text}".encode('utf-8'), digest_size=16).hexdigest()
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM dd_cache").fetchone()[0]
+
+    def get_many(self, keys):
+        with self.lock:
+            return self.read_many(keys)
+
+    def read_many(self, keys):
+        found = {}
+        for start in range(0, len(keys), self.BATCH_SIZE):
+            batch = keys[start:start + self.BATCH_SIZE]
+            query = f"SELECT key, value FROM dd_cache WHERE key IN ({', '.join(['?'] * len(batch))})"
+            for key, value in self.connection.execute(query, batch):
+                found[key] = pickle.loads(value)
+        if found:
+            tick = next(self.clock)
+            self.connection.executemany(
+                "UPDATE dd_cache SET last_used = ? WHERE key = ?",
+                [(tick, key) for key in found]
+            )
+            self.connection.commit()
+        return found
+
+    def put_many(self, items):
+        with self.lock:
+            self.write_many(items)
+
+    def write_many(self, items):
+        tick = next(self.clock)
+        self.connection.executemany(
+            "REPLACE INTO dd_cache (key, value, last_used) VALUES (?, ?, ?)",
+            [(key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), tick) for key, value in items]
+        )
+        self.evict()
+        self.connection.commit()
+
+    def evict(self):
+        overflow = len(self) - self.max_entries
+        if overflow > 0:
+            self.connection.execute(
+                "DELETE FROM dd_cache WHERE key IN (SELECT key FROM dd_cache ORDER BY last_used LIMIT ?)",
+                (overflow,)
+            )
+
+    def get_or_compute(self, kind, params, texts, compute):
+        """
+        Returns one cached value per text, calling compute(indices) for the misses.
+
+        compute receives the positions of the uncached texts and must return their
+        values in the same order; those values are written back to the cache.
+        """
+        keys, found, missing = self.lookup(kind, params, texts)
+        return self.store(keys, found, missing, compute(missing) if missing else [])
+
+    def lookup(self, kind, params, texts):
+        """
+        First half of get_or_compute: returns the keys of texts, the cached values found and the positions missing.
+        """
+        keys = [DdCache.key(kind, params, text) for text in texts]
+        found = self.get_many(list(set(keys)))
+        missing = [i for i, key in enumerate(keys) if key not in found]
+        self.hits += len(keys) - len(missing)
+        self.misses += len(missing)
+        return keys, found, missing
+
+    def store(self, keys, found, missing, computed):
+        """
+        Second half of get_or_compute: caches the values computed for the missing positions and returns every value.
+        """
+        if missing:
+            fresh = {}
+            for i, value in zip(missing, computed):
+                fresh[keys[i]] = value
+            self.put_many(fresh.items())
+            found.update(fresh)
+        return [found[key] for key in keys]
+
+    def close(self):
+        self.connection.close()
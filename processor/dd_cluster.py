@@ -0,0 +1,116 @@
+class UnionFind:
+    """
+    Disjoint sets over arbitrary hashable ids, with path compression and union by size.
+    """
+
+    def __init__(self):
+        self.parent = {}
+        self.size = {}
+
+    def find(self, x):
+        parent = self.parent
+        if x not in parent:
+            parent[x] = x
+            self.size[x] = 1
+            return x
+        root = x
+        while parent[root] != root:
+            root = parent[root]
+        while parent[x] != root:
+            parent[x], x = root, parent[x]
+        return root
+
+    def union(self, a, b):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            return root_a
+        if self.size[root_a] < self.size[root_b]:
+            root_a, root_b = root_b, root_a
+        self.parent[root_b] = root_a
+        self.size[root_a] += self.size[root_b]
+        return root_a
+
+    def groups(self):
+        groups = {}
+        for x in self.parent:
+            groups.setdefault(self.find(x), []).append(x)
+        return groups
+
+
+class DuplicateClusters:
+    """
+    Groups similar pairs into duplicate clusters and picks one survivor per cluster.
+
+    Survivor rules:
+    lowest_id: keep the smallest id of the cluster.
+    longest_text: keep the row with the longest text, ties going to the lowest id.
+    It takes a map of every clustered id to the length of its text.
+    """
+
+    RULES = ('lowest_id', 'longest_text')
+
+    def __init__(self, similar_pairs, rule='lowest_id', lengths=None):
+        if rule not in DuplicateClusters.RULES:
+            raise ValueError(f"Unknown survivor rule '{rule}', expected one of {DuplicateClusters.RULES}")
+        if rule == 'longest_text' and lengths is None:
+            raise ValueError("The longest_text rule needs the text lengths of the clustered ids")
+
+        union_find = UnionFind()
+        for pair in similar_pairs:
+            union_find.union(pair['id1'], pair['id2'])
+
+        self.clusters = {}
+        for members in union_find.groups().values():
+            if len(members) < 2:
+                continue
+            if rule == 'longest_text':
+                survivor = min(members, key=lambda doc_id: (-lengths.get(doc_id, 0), doc_id))
+            else:
+                survivor = min(members)
+            self.clusters[survivor] = sorted(members)
+
+    @classmethod
+    def from_matches(cls, similar_pairs):
+        """
+        Clusters (indexed id1, new id2) pairs of incremental mode without merging indexed rows.
+
+        Each new id2 joins the cluster of the first indexed row it matched, so a
+        new row matching two survivors never makes one of them a duplicate.
+        """
+        clusters = cls([])
+        assigned = set()
+        for pair in similar_pairs:
+            kept, duplicate = pair['id1'], pair['id2']
+            if kept == duplicate or duplicate in assigned:
+                continue
+            assigned.add(duplicate)
+            clusters.clusters.setdefault(kept, [kept]).append(duplicate)
+        for members in clusters.clusters.values():
+            members.sort()
+        return clusters
+
+    def __len__(self):
+        return len(self.clusters)
+
+    def duplicates(self):
+        """
+        Returns a map of every non-surviving id to the survivor of its cluster.
+        """
+        return {
+            doc_id: survivor
+            for survivor, members in self.clusters.items()
+            for doc_id in members
+            if doc_id != survivor
+        }
+
+    def rows(self):
+        """
+        Returns one (cluster_id, id, is_survivor) row per clustered id.
+
+        The cluster id is the id of the cluster's survivor.
+        """
+        return [
+            {'cluster_id': survivor, 'id': doc_id, 'is_survivor': doc_id == survivor}
+            for survivor, members in sorted(self.clusters.items())
+            for doc_id in members
+        ]
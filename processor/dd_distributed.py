@@ -0,0 +1,245 @@
+import os
+import glob
+import time
+import shutil
+import tempfile
+import itertools
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import jieba
+import numpy as np
+from .dd_index import band_hashes
+
+
+# one shuffle record per (row, band): the band's bucket key and where the row's features are stored
+SHUFFLE_DTYPE = np.dtype([('band', '<u2'), ('key', '<u8'), ('batch', '<u4'), ('row', '<u4')])
+
+
+class MinHashBands:
+    """
+    LSH bands of a MinHashIndex, as used by the map and reduce steps of DistributedDedup.
+    """
+
+    def __init__(self, index):
+        self.threshold = index.threshold
+        self.bands = index.bands
+        self.rows = index.rows
+        self.verify = index.verify
+
+    def keys(self, signatures):
+        return band_hashes(np.asarray(signatures, dtype=np.uint32), self.bands, self.rows)
+
+    def matrix(self, signatures):
+        return np.asarray(signatures, dtype=np.uint32)
+
+    def similar(self, left, right):
+        if not self.verify:
+            return np.ones(len(left), dtype=bool)
+        return (left == right).mean(axis=1) >= self.threshold
+
+
+class SimhashBands:
+    """
+    Bit blocks of a SimhashIndex, as used by the map and reduce steps of DistributedDedup.
+    """
+
+    MASK = (1 << 64) - 1
+
+    def __init__(self, index):
+        self.index = index
+
+    def keys(self, fingerprints):
+        # blocks wider than 64 bits (only with max_distance 0) are folded into a uint64
+        keys = [[part & SimhashBands.MASK ^ part >> 64 for part in self.index.parts(fingerprint)] for fingerprint in fingerprints]
+        return np.array(keys, dtype=np.uint64).reshape(len(fingerprints), self.index.blocks)
+
+    def matrix(self, fingerprints):
+        rows = [(fingerprint & SimhashBands.MASK, fingerprint >> 64) for fingerprint in fingerprints]
+        return np.array(rows, dtype=np.uint64).reshape(len(fingerprints), 2)
+
+    def similar(self, left, right):
+        distances = np.unpackbits(np.ascontiguousarray(left ^ right).view(np.uint8), axis=1).sum(axis=1)
+        return distances <= self.index.max_distance
+
+
+def map_batch(features, bands, directory, partitions, batch_number, ids, texts, cached=None):
+    """
+    Map step: hashes one batch and shuffles its band keys into one file per partition.
+
+    Runs in a worker process. The features and ids of the batch are saved
+    for the reduce step to verify candidates with. cached maps positions of
+    the batch to features the coordinator found in its cache; only the other
+    texts are hashed, and their features are returned for it to cache.
+    Returns the row count and those fresh features (None without cached).
+    """
+    fresh = None
+    if cached is None:
+        values = features(texts)
+    else:
+        missing = [i for i in range(len(texts)) if i not in cached]
+        fresh = features([texts[i] for i in missing]) if missing else []
+        values = [cached.get(i) for i in range(len(texts))]
+        for i, value in zip(missing, fresh):
+            values[i] = value
+    np.save(os.path.join(directory, f'features_{batch_number}.npy'), bands.matrix(values))
+    np.save(os.path.join(directory, f'ids_{batch_number}.npy'), np.asarray(ids, dtype=np.int64))
+
+    keys = bands.keys(values)
+    records = np.empty(keys.size, dtype=SHUFFLE_DTYPE)
+    records['band'] = np.tile(np.arange(keys.shape[1], dtype=np.uint16), len(ids))
+    records['key'] = keys.ravel()
+    records['batch'] = batch_number
+    records['row'] = np.repeat(np.arange(len(ids), dtype=np.uint32), keys.shape[1])
+    # partitioning by band key sends every bucket to exactly one reducer
+    partition_of = records['key'] % np.uint64(partitions)
+    for partition in range(partitions):
+        np.save(os.path.join(directory, f'shuffle_{batch_number}_{partition}.npy'), records[partition_of == partition])
+    return len(ids), fresh
+
+
+def gather(directory, prefix, positions, cache):
+    """
+    Reads the saved rows at (batch << 32 | row) positions, one memory-mapped batch file at a time.
+    """
+    batches = positions >> 32
+    rows = positions & 0xffffffff
+    result = None
+    for batch in np.unique(batches).tolist():
+        if batch not in cache:
+            cache[batch] = np.load(os.path.join(directory, f'{prefix}_{batch}.npy'), mmap_mode='r')
+        selected = batches == batch
+        values = cache[batch][rows[selected]]
+        if result is None:
+            result = np.empty((len(positions), *values.shape[1:]), dtype=values.dtype)
+        result[selected] = values
+    return result
+
+
+def reduce_partition(bands, directory, partition, batch_count, chunk_size=65536):
+    """
+    Reduce step: groups one partition's records into buckets and verifies their pairs.
+
+    Runs in a worker process and writes the similar (earlier id, later id)
+    pairs to pairs_{partition}.npy. Returns the candidate and pair counts.
+    """
+    runs = [np.load(os.path.join(directory, f'shuffle_{batch}_{partition}.npy')) for batch in range(batch_count)]
+    records = np.concatenate(runs) if runs else np.empty(0, dtype=SHUFFLE_DTYPE)
+    records = records[np.lexsort((records['row'], records['batch'], records['key'], records['band']))]
+    positions = (records['batch'].astype(np.int64) << 32) | records['row']
+    changes = (records['band'][1:] != records['band'][:-1]) | (records['key'][1:] != records['key'][:-1])
+    starts = np.concatenate(([0], np.flatnonzero(changes) + 1, [len(records)]))
+
+    features = {}
+    ids = {}
+    pairs = []
+    left, right = [], []
+    pending = 0
+    candidate_count = 0
+
+    def verify():
+        first, second = np.concatenate(left), np.concatenate(right)
+        keep = bands.similar(gather(directory, 'features', first, features), gather(directory, 'features', second, features))
+        if keep.any():
+            pairs.append(np.stack([gather(directory, 'ids', first[keep], ids), gather(directory, 'ids', second[keep], ids)], axis=1))
+        left.clear()
+        right.clear()
+
+    for start, end in zip(starts[:-1].tolist(), starts[1:].tolist()):
+        # positions are sorted within a bucket, so every pair is (earlier, later)
+        for i in range(start, end - 1):
+            left.append(np.full(end - i - 1, positions[i]))
+            right.append(positions[i + 1:end])
+            pending += end - i - 1
+            if pending >= chunk_size:
+                candidate_count += pending
+                pending = 0
+                verify()
+    if pending:
+        candidate_count += pending
+        verify()
+
+    # a pair sharing buckets in several bands of this partition is verified once per bucket
+    result = np.unique(np.concatenate(pairs), axis=0) if pairs else np.empty((0, 2), dtype=np.int64)
+    np.save(os.path.join(directory, f'pairs_{partition}.npy'), result)
+    return candidate_count, len(result)
+
+
+class DistributedDedup:
+    """
+    Band-partitioned MinHash/SimHash dedup over several worker processes.
+
+    A local coordinator hands batches to `workers` processes (map), which hash
+    them and shuffle their band keys into `partitions` files each through
+    `directory`. Once every batch is mapped, each partition is reduced by one
+    worker: its buckets are grouped and their candidate pairs verified. The
+    coordinator merges the pairs of all partitions; the processor's global
+    union-find then turns them into clusters.
+
+    map_batch and reduce_partition only exchange files, so with `directory`
+    on a shared filesystem they can be run on other machines as well.
+    Ids must be integers. With a cache, the coordinator looks every batch up
+    under cache_key and the workers only hash the texts it does not hold.
+    """
+
+    def __init__(self, features, bands, workers=4, partitions=None, directory='./data/shuffle', cache=None, cache_key=None):
+        self.features = features
+        self.bands = bands
+        self.cache = cache if cache_key is not None else None
+        self.cache_key = cache_key
+        self.workers = max(workers, 1)
+        self.partitions = partitions or self.workers
+        self.directory = directory
+        self.stats = {}
+
+    def collect(self, future, looked_up):
+        count, fresh = future.result()
+        self.stats['rows'] += count
+        if looked_up is not None:
+            self.cache.store(*looked_up, fresh)
+
+    def find_similar_pairs(self, batches, column_name, id='id'):
+        os.makedirs(self.directory, exist_ok=True)
+        work_directory = tempfile.mkdtemp(prefix='dd_shuffle_', dir=self.directory)
+        self.stats = {'workers': self.workers, 'partitions': self.partitions, 'batches': 0, 'rows': 0}
+        try:
+            with ProcessPoolExecutor(self.workers, initializer=jieba.initialize) as executor:
+                start = time.perf_counter()
+                pending = deque()
+                for batch in batches:
+                    if not batch:
+                        continue
+                    texts = [article[column_name] for article in batch]
+                    looked_up = cached = None
+                    if self.cache is not None:
+                        looked_up = self.cache.lookup(*self.cache_key, texts)
+                        keys, found, missing = looked_up
+                        missing_positions = set(missing)
+                        cached = {i: found[key] for i, key in enumerate(keys) if i not in missing_positions}
+                    pending.append((executor.submit(
+                        map_batch, self.features, self.bands, work_directory, self.partitions, self.stats['batches'],
+                        [article[id] for article in batch], texts, cached
+                    ), looked_up))
+                    self.stats['batches'] += 1
+                    # bounds the batches held in memory while the workers are busy
+                    while len(pending) > 2 * self.workers:
+                        self.collect(*pending.popleft())
+                while pending:
+                    self.collect(*pending.popleft())
+                self.stats['map_seconds'] = time.perf_counter() - start
+
+                start = time.perf_counter()
+                counts = list(executor.map(
+                    reduce_partition, itertools.repeat(self.bands), itertools.repeat(work_directory),
+                    range(self.partitions), itertools.repeat(self.stats['batches'])
+                ))
+                self.stats['reduce_seconds'] = time.perf_counter() - start
+            self.stats['candidates'] = sum(candidates for candidates, _ in counts)
+
+            # a pair sharing buckets in bands of different partitions is found by each of them
+            pairs = [np.load(path) for path in sorted(glob.glob(os.path.join(work_directory, 'pairs_*.npy')))]
+            pairs = np.unique(np.concatenate(pairs), axis=0) if pairs else np.empty((0, 2), dtype=np.int64)
+            self.stats['pairs'] = len(pairs)
+            print(f"Distributed over {self.workers} workers: {self.stats['batches']} batches, {self.stats['candidates']} candidates, {len(pairs)} pairs")
+            return [{'id1': id1, 'id2': id2} for id1, id2 in pairs.tolist()]
+        finally:
+            shutil.rmtree(work_directory, ignore_errors=True)
@@ -0,0 +1,378 @@
+import os
+import heapq
+import shutil
+import tempfile
+import itertools
+import numpy as np
+from collections import defaultdict
+from datasketch import LeanMinHash, MinHashLSH
+
+
+def popcount(values):
+    """
+    Counts the set bits of every row of a uint64 matrix.
+    """
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(values).sum(axis=1, dtype=np.int64)
+    return np.unpackbits(np.ascontiguousarray(values).view(np.uint8), axis=1).sum(axis=1, dtype=np.int64)
+
+
+class SimhashIndex:
+    """
+    Banded SimHash index for near-duplicate lookup.
+
+    The fingerprint is split into `blocks` contiguous bit ranges. By the
+    pigeonhole principle, two fingerprints within `max_distance` bits of each
+    other agree exactly on at least one block whenever blocks > max_distance,
+    so exact-match buckets per block give every candidate, which is then
+    verified by Hamming distance.
+
+    Fingerprints are kept as an (n, 2) uint64 matrix, and the candidates of
+    a query are verified with one vectorized XOR and popcount. Blocks
+    narrower than MIN_BLOCK_BITS bits (max_distance above 9 with 128-bit
+    fingerprints, i.e. thresholds below 0.93) are shared by a large fraction
+    of unrelated fingerprints, so nearly every row would be a candidate;
+    such an index keeps no buckets and scans every indexed fingerprint
+    instead, SCAN_ROWS rows at a time. Passing fewer blocks than
+    max_distance + 1 keeps buckets selective but can miss pairs whose
+    differing bits touch every block.
+    """
+
+    MIN_BLOCK_BITS = 12
+    SCAN_ROWS = 65536
+    MASK = (1 << 64) - 1
+
+    # bucket hits checked by query, kept on the class so older pickled indexes still load
+    candidate_count = 0
+
+    def __init__(self, max_distance, hash_bits=128, blocks=None):
+        if blocks is None:
+            blocks = max_distance + 1
+        if not 0 < blocks <= hash_bits:
+            raise ValueError(f"blocks must be in 1..{hash_bits}, got {blocks}")
+
+        self.max_distance = max_distance
+        self.hash_bits = hash_bits
+        self.blocks = blocks
+        self.scan = hash_bits // blocks < SimhashIndex.MIN_BLOCK_BITS
+
+        # spread the remainder over the first blocks so widths differ by at most one bit
+        width, extra = divmod(hash_bits, blocks)
+        self.ranges = []
+        offset = 0
+        for i in range(blocks):
+            size = width + (1 if i < extra else 0)
+            self.ranges.append((offset, (1 << size) - 1))
+            offset += size
+
+        self.buckets = [defaultdict(list) for _ in range(blocks)]
+        self.matrix = np.zeros((1024, 2), dtype=np.uint64)
+        self.ids = []
+        self.positions = {}
+
+    def __setstate__(self, state):
+        # indexes pickled before the matrix kept a {id: fingerprint} map and id buckets
+        fingerprints = state.pop('fingerprints', None)
+        self.__dict__.update(state)
+        if fingerprints is not None:
+            self.scan = self.hash_bits // self.blocks < SimhashIndex.MIN_BLOCK_BITS
+            self.buckets = [defaultdict(list) for _ in range(self.blocks)]
+            self.matrix = np.zeros((max(len(fingerprints), 1024), 2), dtype=np.uint64)
+            self.ids = []
+            self.positions = {}
+            for doc_id, fingerprint in fingerprints.items():
+                self.add(doc_id, fingerprint)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, doc_id):
+        return doc_id in self.positions
+
+    @property
+    def fingerprints(self):
+        """
+        The indexed fingerprints as an {id: int} map, in insertion order.
+        """
+        rows = self.matrix[:len(self.ids)].tolist()
+        return {doc_id: low | high << 64 for doc_id, (low, high) in zip(self.ids, rows)}
+
+    def parts(self, fingerprint):
+        return [(fingerprint >> offset) & mask for offset, mask in self.ranges]
+
+    def join_parts(self, parts):
+        fingerprint = 0
+        for (offset, _), part in zip(self.ranges, parts):
+            fingerprint |= int(part) << offset
+        return fingerprint
+
+    def add(self, doc_id, fingerprint):
+        position = self.positions.get(doc_id)
+        if position is None:
+            position = self.positions[doc_id] = len(self.ids)
+            self.ids.append(doc_id)
+            if position == len(self.matrix):
+                self.matrix = np.concatenate([self.matrix, np.zeros_like(self.matrix)])
+        self.matrix[position] = (fingerprint & SimhashIndex.MASK, fingerprint >> 64)
+        if not self.scan:
+            for bucket, part in zip(self.buckets, self.parts(fingerprint)):
+                bucket[part].append(position)
+
+    # same name as MinHashIndex.insert, so callers can fill either index
+    insert = add
+
+    def query(self, fingerprint):
+        """
+        Returns the ids of indexed fingerprints within max_distance bits, in insertion order.
+        """
+        count = len(self.ids)
+        if not count:
+            return []
+        row = np.array([fingerprint & SimhashIndex.MASK, fingerprint >> 64], dtype=np.uint64)
+        if self.scan:
+            matched = []
+            for start in range(0, count, SimhashIndex.SCAN_ROWS):
+                distances = popcount(self.matrix[start:min(start + SimhashIndex.SCAN_ROWS, count)] ^ row)
+                matched.append(np.flatnonzero(distances <= self.max_distance) + start)
+            matched = np.concatenate(matched)
+            self.candidate_count += count
+        else:
+            hits = itertools.chain.from_iterable(bucket.get(part, ()) for bucket, part in zip(self.buckets, self.parts(fingerprint)))
+            candidates = np.unique(np.fromiter(hits, dtype=np.int64))
+            self.candidate_count += len(candidates)
+            matched = candidates[popcount(self.matrix[candidates] ^ row) <= self.max_distance]
+        return [self.ids[position] for position in matched.tolist()]
+
+    def to_rows(self):
+        """
+        Returns (id, part1, ..., partN) rows matching DatabaseUtils.create_simhash_table(n=blocks).
+        """
+        return [(doc_id, *self.parts(fingerprint)) for doc_id, fingerprint in self.fingerprints.items()]
+
+    @classmethod
+    def from_rows(cls, rows, max_distance, hash_bits=128, blocks=None):
+        index = cls(max_distance, hash_bits=hash_bits, blocks=blocks)
+        for row in rows:
+            index.add(row[0], index.join_parts(row[1:]))
+        return index
+
+
+class MinHashIndex:
+    """
+    MinHashLSH over uint32 signature rows, with optional candidate verification.
+
+    The LSH only proposes candidates; with verify=True each candidate is kept only
+    if the fraction of equal signature positions (the estimated Jaccard
+    similarity) reaches the threshold. Band/row split and the false
+    positive/negative weights are passed through to MinHashLSH.
+    """
+
+    # lsh candidates returned before verification, kept on the class so older pickled indexes still load
+    candidate_count = 0
+
+    def __init__(self, threshold, num_perm=128, seed=1, bands=None, rows=None, weights=(0.5, 0.5), verify=True):
+        params = None
+        if bands or rows:
+            if not (bands and rows):
+                raise ValueError("lsh bands and rows must be set together")
+            if bands * rows > num_perm:
+                raise ValueError(f"bands * rows must not exceed num_perm, got {bands} * {rows} > {num_perm}")
+            params = (bands, rows)
+
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.seed = seed
+        self.verify = verify
+        self.lsh = MinHashLSH(threshold=threshold, num_perm=num_perm, weights=tuple(weights), params=params)
+        self.bands, self.rows = self.lsh.b, self.lsh.r
+        self.signatures = {}
+
+    def __len__(self):
+        return len(self.lsh.keys)
+
+    def __contains__(self, doc_id):
+        return doc_id in self.lsh
+
+    def minhash(self, signature):
+        return LeanMinHash(seed=self.seed, hashvalues=signature, scheme='affine32')
+
+    def insert(self, doc_id, signature):
+        self.lsh.insert(doc_id, self.minhash(signature))
+        if self.verify:
+            self.signatures[doc_id] = np.array(signature, dtype=np.uint32)
+
+    def insert_many(self, doc_ids, signatures):
+        with self.lsh.insertion_session() as session:
+            for doc_id, signature in zip(doc_ids, signatures):
+                session.insert(doc_id, self.minhash(signature))
+        if self.verify:
+            self.signatures.update(zip(doc_ids, np.array(signatures, dtype=np.uint32)))
+
+    def query(self, signature):
+        candidates = self.lsh.query(self.minhash(signature))
+        self.candidate_count += len(candidates)
+        if not self.verify or not candidates:
+            return candidates
+        stored = np.stack([self.signatures[doc_id] for doc_id in candidates])
+        estimates = (stored == signature).mean(axis=1)
+        return [doc_id for doc_id, estimate in zip(candidates, estimates) if estimate >= self.threshold]
+
+
+def band_hashes(signatures, bands, rows):
+    """
+    Hashes the rows of every band of every signature into one uint64 (FNV-1a over the uint32 values).
+
+    Returns a (len(signatures), bands) uint64 array; rows in the same LSH
+    bucket of a band get the same hash.
+    """
+    values = signatures[:, :bands * rows].astype(np.uint64).reshape(len(signatures), bands, rows)
+    hashes = np.full((len(signatures), bands), 0xcbf29ce484222325, dtype=np.uint64)
+    for k in range(rows):
+        hashes = (hashes ^ values[:, :, k]) * np.uint64(0x100000001b3)
+    return hashes ^ (hashes >> np.uint64(29))
+
+
+class SpilledMinHashIndex:
+    """
+    Out-of-core MinHash LSH for corpora whose signatures do not fit in memory.
+
+    Signatures are appended to a file that pairs() reads back as a
+    memory-mapped uint32 matrix, ids to an int64 file next to it, so ids must
+    be integers. For every band a 64-bit hash of its rows is buffered with the
+    row position; every spill_rows rows the buffers are sorted by hash and
+    written as one run file per band. pairs() k-way merges the runs of each
+    band, so every bucket arrives as consecutive entries, and verifies the
+    candidates of each bucket against the memory-mapped signatures. A pair
+    that also shares a bucket in an earlier band is skipped, recomputing the
+    band hashes of both rows instead of remembering the pairs checked, so
+    memory stays bounded by spill_rows buffered rows and one chunk per run
+    and per band instead of growing with the corpus or its candidates.
+
+    Band/row split, weights and verification behave as in MinHashIndex.
+    Work files live in a temporary directory under `directory`, removed by
+    close().
+    """
+
+    RUN_DTYPE = np.dtype([('hash', '<u8'), ('position', '<u8')])
+
+    def __init__(self, directory, threshold, num_perm=128, bands=None, rows=None, weights=(0.5, 0.5), verify=True, spill_rows=1000000, chunk_rows=65536):
+        # validates the split and picks the optimal one like the in-memory index
+        params = MinHashIndex(threshold, num_perm=num_perm, bands=bands, rows=rows, weights=weights, verify=False)
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.verify = verify
+        self.bands, self.rows = params.bands, params.rows
+        self.spill_rows = spill_rows
+        self.chunk_rows = chunk_rows
+        self.candidate_count = 0
+        self.count = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self.directory = tempfile.mkdtemp(prefix='dd_lsh_', dir=directory)
+        self.signature_path = os.path.join(self.directory, 'signatures.u32')
+        self.id_path = os.path.join(self.directory, 'ids.i64')
+        self.signature_file = open(self.signature_path, 'wb')
+        self.id_file = open(self.id_path, 'wb')
+        self.buffer = [[] for _ in range(self.bands)]
+        self.buffered = 0
+        self.runs = [[] for _ in range(self.bands)]
+
+    def __len__(self):
+        return self.count
+
+    def band_hashes(self, signatures):
+        return band_hashes(signatures, self.bands, self.rows)
+
+    def insert_many(self, doc_ids, signatures):
+        signatures = np.ascontiguousarray(signatures, dtype=np.uint32).reshape(-1, self.num_perm)
+        ids = np.asarray(doc_ids, dtype=np.int64)
+        self.signature_file.write(signatures.tobytes())
+        self.id_file.write(ids.tobytes())
+
+        positions = np.arange(self.count, self.count + len(ids), dtype=np.uint64)
+        hashes = self.band_hashes(signatures)
+        for band in range(self.bands):
+            self.buffer[band].append((hashes[:, band], positions))
+        self.count += len(ids)
+        self.buffered += len(ids)
+        if self.buffered >= self.spill_rows:
+            self.spill()
+
+    def spill(self):
+        if not self.buffered:
+            return
+        for band in range(self.bands):
+            run = np.empty(self.buffered, dtype=SpilledMinHashIndex.RUN_DTYPE)
+            run['hash'] = np.concatenate([hashes for hashes, _ in self.buffer[band]])
+            run['position'] = np.concatenate([positions for _, positions in self.buffer[band]])
+            # positions are ascending, a stable sort keeps them so within a bucket
+            run = run[np.argsort(run['hash'], kind='stable')]
+            path = os.path.join(self.directory, f'band{band}_run{len(self.runs[band])}.npy')
+            np.save(path, run)
+            self.runs[band].append(path)
+            self.buffer[band] = []
+        self.buffered = 0
+
+    def run_entries(self, path):
+        run = np.load(path, mmap_mode='r')
+        for start in range(0, len(run), self.chunk_rows):
+            chunk = np.array(run[start:start + self.chunk_rows])
+            yield from zip(chunk['hash'].tolist(), chunk['position'].tolist())
+
+    def buckets(self, band):
+        """
+        Yields the positions of every bucket of a band holding more than one row.
+        """
+        entries = heapq.merge(*[self.run_entries(path) for path in self.runs[band]])
+        for _, group in itertools.groupby(entries, key=lambda entry: entry[0]):
+            positions = [position for _, position in group]
+            if len(positions) > 1:
+                yield positions
+
+    def verified(self, band, candidates, signatures, ids):
+        candidates = np.array(candidates, dtype=np.int64)
+        left, right = signatures[candidates[:, 0]], signatures[candidates[:, 1]]
+        if band:
+            # a pair sharing a bucket in an earlier band was checked there already
+            earlier = self.band_hashes(left)[:, :band] == self.band_hashes(right)[:, :band]
+            keep = ~earlier.any(axis=1)
+            candidates, left, right = candidates[keep], left[keep], right[keep]
+        self.candidate_count += len(candidates)
+        if self.verify:
+            estimates = (left == right).mean(axis=1)
+            candidates = candidates[estimates >= self.threshold]
+        for i, j in candidates.tolist():
+            yield int(ids[i]), int(ids[j])
+
+    def pairs(self):
+        """
+        Yields every similar pair once, as (earlier id, later id), bucket by bucket.
+        """
+        self.spill()
+        self.signature_file.close()
+        self.id_file.close()
+        if not self.count:
+            return
+        signatures = np.memmap(self.signature_path, dtype=np.uint32, mode='r', shape=(self.count, self.num_perm))
+        ids = np.memmap(self.id_path, dtype=np.int64, mode='r', shape=(self.count,))
+
+        for band in range(self.bands):
+            candidates = []
+            for positions in self.buckets(band):
+                # a hot bucket (empty or boilerplate texts) is expanded chunk_rows pairs at a time
+                combinations = itertools.combinations(sorted(positions), 2)
+                while True:
+                    chunk = list(itertools.islice(combinations, self.chunk_rows - len(candidates)))
+                    if not chunk:
+                        break
+                    candidates.extend(chunk)
+                    if len(candidates) >= self.chunk_rows:
+                        yield from self.verified(band, candidates, signatures, ids)
+                        candidates = []
+            if candidates:
+                yield from self.verified(band, candidates, signatures, ids)
+
+    def close(self):
+        self.signature_file.close()
+        self.id_file.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
@@ -1,18 +1,241 @@
+import os
 import time
+import pickle
 import logging
+import itertools
+import jieba
+from functools import partial
+import pandas as pd
 from typing import Literal
-from .dd_algorithm import TfidfSimilarity, SimhashSimilarity, MinHashSimilarity
+from .dd_algorithm import TfidfSimilarity, SimhashSimilarity, MinHashSimilarity, MultiFieldSimilarity
+from .dd_cluster import DuplicateClusters
+from .dd_report import DdReport
+from .dd_scheduler import Stage, StagedScheduler
+from .dd_distributed import DistributedDedup
+from .db_backend import MySQLBackend
+
+def featurize_batch(features, column_name, id, batch):
+    # runs in a scheduler worker process, so it has to be a module level function
+    return [article[id] for article in batch], features([article[column_name] for article in batch])
+
+def featurize_texts(features, item):
+    # cached runs send only the texts missing from the cache, tagged with their batch number
+    number, texts = item
+    return number, features(texts) if texts else []
 
 class DdProcessor:
-    def __init__(self, threshold: float = 0.7, method: Literal['tfidf', 'simhash', 'minhash'] = 'minhash', id = 'id'):
+    def __init__(self, threshold: float = 0.7, method: Literal['tfidf', 'simhash', 'minhash', 'multifield'] = 'minhash', id = 'id', workers: int = 1, cache = None, removal: Literal['delete', 'mark'] = 'delete', batch_size: int = 1000, survivor: Literal['lowest_id', 'longest_text'] = 'lowest_id', streaming: bool = False, fetch_size: int = 5000, strategy_options: dict = None, report: DdReport = None, backend = None, pipeline: bool = False, queue_size: int = 2, distributed: int = 0, shuffle_directory: str = './data/shuffle'):
         self.THRESHOLD = threshold
         self.METHOD = method
         self.ID = id
+        self.WORKERS = workers
+        self.CACHE = cache
+        self.REMOVAL = removal
+        self.BATCH_SIZE = batch_size
+        self.SURVIVOR = survivor
+        self.STREAMING = streaming
+        self.FETCH_SIZE = fetch_size
+        self.STRATEGY_OPTIONS = strategy_options or {}
+        self.REPORT = report if report is not None else DdReport(enabled=False)
+        self.BACKEND = backend if backend is not None else MySQLBackend()
+        self.PIPELINE = pipeline
+        self.QUEUE_SIZE = queue_size
+        self.DISTRIBUTED = distributed
+        self.SHUFFLE_DIRECTORY = shuffle_directory
+        self.clusters = None
+
+    @staticmethod
+    def strategy_options(processor_config):
+        """
+        Reads the method specific options of a [processor] config section.
+        """
+        def optional_int(key):
+            value = processor_config.get(key, fallback='').strip()
+            return int(value) if value else None
+        
+        method = processor_config.get('method', fallback='minhash')
+        options = {
+            'tokenizer': processor_config.get('tokenizer', fallback='jieba'),
+            'shingle_k': processor_config.getint('shingle_k', fallback=2),
+        }
+        if method == 'minhash':
+            options.update({
+                'num_perm': processor_config.getint('num_perm', fallback=128),
+                'bands': optional_int('lsh_bands'),
+                'rows': optional_int('lsh_rows'),
+                'weights': (
+                    processor_config.getfloat('fp_weight', fallback=0.5),
+                    processor_config.getfloat('fn_weight', fallback=0.5),
+                ),
+                'verify': processor_config.getboolean('verify', fallback=True),
+                'spill_directory': processor_config.get('spill_directory', fallback='').strip() or None,
+                'spill_rows': processor_config.getint('spill_rows', fallback=1000000),
+            })
+        elif method == 'simhash':
+            options['hash_func'] = processor_config.get('simhash_hash', fallback='xxh3')
+            options['blocks'] = optional_int('simhash_blocks')
+        elif method == 'tfidf':
+            options['top_k'] = optional_int('tfidf_top_k')
+            options['model_path'] = processor_config.get('tfidf_model', fallback='').strip() or None
+        elif method == 'multifield':
+            blocking_threshold = processor_config.get('blocking_threshold', fallback='').strip()
+            options.update({
+                'blocking_threshold': float(blocking_threshold) if blocking_threshold else None,
+                'num_perm': processor_config.getint('num_perm', fallback=128),
+                'hash_func': processor_config.get('simhash_hash', fallback='xxh3'),
+            })
+        return options
+
+    @staticmethod
+    def from_config(processor_config, cache=None, report=None, backend=None):
+        """
+        Builds a processor from a [processor] config section.
+        """
+        return DdProcessor(
+            threshold=float(processor_config['threshold']),
+            method=processor_config['method'],
+            workers=processor_config.getint('workers', fallback=1),
+            cache=cache,
+            removal=processor_config.get('removal', fallback='delete'),
+            survivor=processor_config.get('survivor', fallback='lowest_id'),
+            streaming=processor_config.getboolean('streaming', fallback=False),
+            fetch_size=processor_config.getint('fetch_size', fallback=5000),
+            strategy_options=DdProcessor.strategy_options(processor_config),
+            report=report,
+            backend=backend,
+            pipeline=processor_config.getboolean('pipeline', fallback=False),
+            queue_size=processor_config.getint('queue_size', fallback=2),
+            distributed=processor_config.getint('distributed', fallback=0),
+            shuffle_directory=processor_config.get('shuffle_directory', fallback='./data/shuffle')
+        )
+
+    @staticmethod
+    def parse_columns(process_column):
+        """
+        Parses "title" into "title" and "title:0.4, content:0.6" into {'title': 0.4, 'content': 0.6}.
+        """
+        if ':' not in process_column:
+            return process_column.strip()
+        columns = {}
+        for item in process_column.split(','):
+            field, weight = item.split(':')
+            columns[field.strip()] = float(weight)
+        return columns
+
+    def create_strategy(self):
+        if self.METHOD == 'tfidf':
+            strategy = TfidfSimilarity(workers=self.WORKERS, cache=self.CACHE, report=self.REPORT, **self.STRATEGY_OPTIONS)
+        elif self.METHOD == 'simhash':
+            strategy = SimhashSimilarity(workers=self.WORKERS, cache=self.CACHE, report=self.REPORT, **self.STRATEGY_OPTIONS)
+        elif self.METHOD == 'minhash':
+            strategy = MinHashSimilarity(workers=self.WORKERS, cache=self.CACHE, report=self.REPORT, **self.STRATEGY_OPTIONS)
+        elif self.METHOD == 'multifield':
+            strategy = MultiFieldSimilarity(workers=self.WORKERS, cache=self.CACHE, report=self.REPORT, **self.STRATEGY_OPTIONS)
+        else:
+            raise ValueError("Unknown method")
+        print(f"Using {self.METHOD} method.")
+        return strategy
+
+    def log_pairs(self, similar_pairs):
+        logging.info(f"Found {len(similar_pairs)} similar records.")
+        
+        record = 1
+        for pair in similar_pairs:
+            logging.info(f"pair NO.{record}")
+            logging.info(f"Similarity: {pair['id1']} and {pair['id2']}")
+            # logging.info(f"Text 1: {pair['text1']}")
+            # logging.info(f"Text 2: {pair['text2']}")
+            logging.info("------")
+            record += 1
+
+    def delete_duplicates(self, cursor, duplicates):
+        if self.REMOVAL == 'mark':
+            return self.mark_duplicates(cursor, duplicates)
+        return self.BACKEND.delete_ids(cursor, 'articles_info', self.ID, list(duplicates), self.BATCH_SIZE)
+
+    def mark_duplicates(self, cursor, duplicates):
+        """
+        Sets articles_info.dup_of for duplicate rows instead of deleting them.
+        """
+        return self.BACKEND.mark_duplicates(cursor, 'articles_info', self.ID, duplicates, self.BATCH_SIZE)
+
+    def pipelined_pairs(self, strategy, batches, column_name):
+        """
+        Finds similar pairs with fetching, hashing and indexing of successive batches overlapped.
+
+        Batches are fetched in a thread, tokenized and hashed in a pool of
+        WORKERS processes, and queried and inserted into the index here, in
+        fetch order, with at most QUEUE_SIZE batches waiting between steps.
+        With a cache, batches are looked up in a thread of this process first
+        and only the uncached texts are sent to the workers.
+        Returns None when the strategy cannot compute its index entries apart.
+        """
+        features = strategy.batch_features()
+        if features is None:
+            return None
+        
+        cache_key = strategy.feature_cache_key() if self.CACHE is not None else None
+        if cache_key is None:
+            stages = [Stage('hash', partial(featurize_batch, features, column_name, self.ID), kind='cpu', workers=self.WORKERS)]
+        else:
+            looked_up = {}
+            numbers = itertools.count()
+            
+            def lookup(batch):
+                number = next(numbers)
+                texts = [article[column_name] for article in batch]
+                keys, found, missing = self.CACHE.lookup(*cache_key, texts)
+                looked_up[number] = ([article[self.ID] for article in batch], keys, found, missing)
+                return number, [texts[i] for i in missing]
+            
+            stages = [Stage('cache', lookup), Stage('hash', partial(featurize_texts, features), kind='cpu', workers=self.WORKERS)]
+        
+        scheduler = StagedScheduler(stages, queue_size=self.QUEUE_SIZE, initializer=jieba.initialize)
+        index = strategy.create_stream_index(self.THRESHOLD)
+        similar_pairs = []
+        try:
+            for result in scheduler.run(batches):
+                if cache_key is None:
+                    ids, batch_features = result
+                else:
+                    number, computed = result
+                    ids, keys, found, missing = looked_up.pop(number)
+                    batch_features = self.CACHE.store(keys, found, missing, computed)
+                strategy.index_batch(index, ids, batch_features, similar_pairs)
+            strategy.finish_index(index, similar_pairs)
+        finally:
+            # spilled indexes own work files
+            if hasattr(index, 'close'):
+                index.close()
+        self.REPORT.info['pipeline'] = scheduler.stats
+        return similar_pairs
+
+    def distributed_pairs(self, strategy, batches, column_name):
+        """
+        Finds similar pairs with DISTRIBUTED worker processes, each generating the candidates of some LSH bands.
+
+        Returns None when the strategy has no bands to partition by.
+        """
+        bands = strategy.distributed_bands(self.THRESHOLD)
+        if bands is None:
+            return None
+        
+        dedup = DistributedDedup(
+            strategy.batch_features(), bands, workers=self.DISTRIBUTED, directory=self.SHUFFLE_DIRECTORY,
+            cache=self.CACHE, cache_key=strategy.feature_cache_key()
+        )
+        similar_pairs = dedup.find_similar_pairs(batches, column_name, self.ID)
+        self.REPORT.info['distributed'] = dedup.stats
+        return similar_pairs
 
     def dd_similarity(self, connection, column_name):
+        """
+        column_name is one column, or a {column: weight} map for the multifield method.
+        """
         start_time = time.time()
         deleted_count = 0
         
+        os.makedirs('./logs', exist_ok=True)
         logging.basicConfig(
             filename=f'./logs/{start_time}_log_.txt',
             level=logging.INFO,
@@ -22,48 +245,246 @@ class DdProcessor:
         print("processing...")
 
         try:
+            columns = ', '.join(column_name) if isinstance(column_name, dict) else column_name
+            # survivors by longest_text compare the first (blocking) field
+            text_column = next(iter(column_name)) if isinstance(column_name, dict) else column_name
+            select_query = f"SELECT {self.ID}, {columns} FROM articles_info"
+            strategy = self.create_strategy()
+            # only the text lengths are kept, the texts of streamed batches are not held for the whole run
+            lengths = {} if self.SURVIVOR == 'longest_text' else None
+            self.REPORT.info.update({'method': self.METHOD, 'threshold': self.THRESHOLD, 'column': column_name})
+            
+            if self.STREAMING:
+                # the unbuffered or sharded read is fully consumed before the cursor below is opened
+                def batches():
+                    for batch in self.BACKEND.read_batches(connection, select_query, 'articles_info', self.ID, self.FETCH_SIZE):
+                        if lengths is not None:
+                            lengths.update((article[self.ID], len(article[text_column] or '')) for article in batch)
+                        yield batch
+                
+                # fetching is interleaved with the strategy, so both are timed as one stage
+                with self.REPORT.stage('similarity') as record:
+                    similar_pairs = None
+                    if self.DISTRIBUTED:
+                        similar_pairs = self.distributed_pairs(strategy, batches(), column_name)
+                    elif self.PIPELINE:
+                        similar_pairs = self.pipelined_pairs(strategy, batches(), column_name)
+                    if similar_pairs is None:
+                        similar_pairs = strategy.find_similar_pairs_streaming(batches(), column_name, self.THRESHOLD, self.ID)
+                    record['pairs'] = len(similar_pairs)
+            
             with connection.cursor(dictionary=True) as cursor:
                 
-                select_query = f"SELECT {self.ID}, {column_name} FROM articles_info"
-                cursor.execute(select_query)
-                articles = cursor.fetchall()
+                if not self.STREAMING:
+                    with self.REPORT.stage('fetch') as record:
+                        cursor.execute(select_query)
+                        articles = cursor.fetchall()
+                        record['rows'] = len(articles)
+                    
+                    with self.REPORT.stage('similarity', len(articles)) as record:
+                        similar_pairs = strategy.find_similar_pairs(articles, column_name, self.THRESHOLD, self.ID)
+                        record['pairs'] = len(similar_pairs)
+                    
+                    if lengths is not None:
+                        lengths.update((article[self.ID], len(article[text_column] or '')) for article in articles)
                 
-                if self.METHOD == 'tfidf':
-                    strategy = TfidfSimilarity()
-                elif self.METHOD == 'simhash':
-                    strategy = SimhashSimilarity()
-                elif self.METHOD == 'minhash':
-                    strategy = MinHashSimilarity()
-                else:
-                    raise ValueError("Unknown method")
-                print(f"Using {self.METHOD} method.")
-            
+                self.log_pairs(similar_pairs)
+                
+                with self.REPORT.stage('cluster', len(similar_pairs)) as record:
+                    self.clusters = DuplicateClusters(similar_pairs, self.SURVIVOR, lengths)
+                    record['clusters'] = len(self.clusters)
+                print(f"Found {len(self.clusters)} duplicate clusters.")
+                
+                # delete similar records
+                duplicates = self.clusters.duplicates()
+                with self.REPORT.stage('delete', len(duplicates)):
+                    deleted_count = self.delete_duplicates(cursor, duplicates)
+                
+            connection.commit()
+        except Exception as e:
+            print(f"Error: {e}")
+            connection.rollback()
+        
+        end_time = time.time()
+        total_time = end_time - start_time
+        self.REPORT.info['removed'] = deleted_count
+        
+        print(f"Total records {'marked' if self.REMOVAL == 'mark' else 'deleted'}: {deleted_count}")
+        print(f"Total time taken: {total_time} seconds")
+
+    def dd_file(self, storage, column_name, output_path, pairs_path=None):
+        """
+        Dedups a file through a FileStorage, without a database.
+
+        The input is read in batches, streamed to the strategy when streaming is
+        on and collected for one find_similar_pairs call otherwise, then copied to
+        output_path without the duplicates (or with a dup_of column when
+        removal is 'mark'). The similar pairs go to pairs_path when given.
+        """
+        start_time = time.time()
+        removed_count = 0
+        print("processing file...")
+
+        columns = list(column_name) if isinstance(column_name, dict) else [column_name]
+        text_column = columns[0]
+        strategy = self.create_strategy()
+        lengths = {} if self.SURVIVOR == 'longest_text' else None
+        self.REPORT.info.update({'method': self.METHOD, 'threshold': self.THRESHOLD, 'column': column_name, 'input': storage.input_path})
+
+        def batches():
+            for batch in storage.read_batches([self.ID, *columns]):
+                if lengths is not None:
+                    lengths.update((article[self.ID], len(article[text_column] or '')) for article in batch)
+                yield batch
+
+        if self.STREAMING:
+            # reading is interleaved with the strategy, so both are timed as one stage
+            with self.REPORT.stage('similarity') as record:
+                similar_pairs = None
+                if self.DISTRIBUTED:
+                    similar_pairs = self.distributed_pairs(strategy, batches(), column_name)
+                elif self.PIPELINE:
+                    similar_pairs = self.pipelined_pairs(strategy, batches(), column_name)
+                if similar_pairs is None:
+                    similar_pairs = strategy.find_similar_pairs_streaming(batches(), column_name, self.THRESHOLD, self.ID)
+                record['pairs'] = len(similar_pairs)
+        else:
+            with self.REPORT.stage('fetch') as record:
+                articles = [article for batch in batches() for article in batch]
+                record['rows'] = len(articles)
+            with self.REPORT.stage('similarity', len(articles)) as record:
                 similar_pairs = strategy.find_similar_pairs(articles, column_name, self.THRESHOLD, self.ID)
+                record['pairs'] = len(similar_pairs)
+        self.log_pairs(similar_pairs)
+
+        with self.REPORT.stage('cluster', len(similar_pairs)) as record:
+            self.clusters = DuplicateClusters(similar_pairs, self.SURVIVOR, lengths)
+            record['clusters'] = len(self.clusters)
+        print(f"Found {len(self.clusters)} duplicate clusters.")
+
+        duplicates = self.clusters.duplicates()
+        with self.REPORT.stage('export', len(duplicates)):
+            storage.write_deduplicated(output_path, duplicates, self.ID, self.REMOVAL)
+        removed_count = len(duplicates)
+        if pairs_path:
+            storage.write_pairs(pairs_path, similar_pairs)
+        
+        end_time = time.time()
+        total_time = end_time - start_time
+        self.REPORT.info['removed'] = removed_count
+        
+        print(f"Total records {'marked' if self.REMOVAL == 'mark' else 'deleted'}: {removed_count}")
+        print(f"Total time taken: {total_time} seconds")
+
+    def export_clusters(self, file_path):
+        """
+        Writes the duplicate clusters of the last run to an Excel file.
+        """
+        if self.clusters is None:
+            return
+        rows = self.clusters.rows()
+        with self.REPORT.stage('export_clusters', len(rows)):
+            df = pd.DataFrame(rows, columns=['cluster_id', 'id', 'is_survivor'])
+            df.to_excel(file_path, index=False)
+        print("------")
+        print(f"{len(self.clusters)} duplicate clusters have been exported to {file_path}")
+
+    @staticmethod
+    def load_index_state(index_path):
+        if not os.path.exists(index_path):
+            return None
+        with open(index_path, 'rb') as f:
+            return pickle.load(f)
+
+    @staticmethod
+    def save_index_state(index_path, state):
+        directory = os.path.dirname(index_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # write beside the target and swap, so a crash never leaves a truncated index
+        tmp_path = f"{index_path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, index_path)
+
+    def dd_incremental(self, connection, column_name, index_path):
+        """
+        Checks only rows above the persisted id watermark against the persisted index.
+
+        New rows matching the index are deleted; the rest are inserted into the
+        index, which is saved back to index_path together with the new watermark
+        once the deletes are committed.
+        """
+        start_time = time.time()
+        deleted_count = 0
+        
+        os.makedirs('./logs', exist_ok=True)
+        logging.basicConfig(
+            filename=f'./logs/{start_time}_log_.txt',
+            level=logging.INFO,
+            format='%(asctime)s - %(levelname)s - %(message)s',
+            encoding='utf-8'
+        )
+        print("processing incrementally...")
+
+        try:
+            strategy = self.create_strategy()
+            state = DdProcessor.load_index_state(index_path)
+            if state is None:
+                state = {
+                    'method': self.METHOD,
+                    'threshold': self.THRESHOLD,
+                    'column': column_name,
+                    'params': strategy.index_params,
+                    'watermark': None,
+                    'index': strategy.create_index(self.THRESHOLD),
+                }
+            elif (state['method'], state['threshold'], state['column'], state.get('params')) != (self.METHOD, self.THRESHOLD, column_name, strategy.index_params):
+                raise ValueError(
+                    f"Index at {index_path} was built with method={state['method']}, threshold={state['threshold']}, "
+                    f"column={state['column']}, params={state.get('params')}; remove it to rebuild with the current settings"
+                )
+            print(f"Watermark: {state['watermark']}")
+            self.REPORT.info.update({'method': self.METHOD, 'threshold': self.THRESHOLD, 'column': column_name, 'watermark': state['watermark']})
+
+            with connection.cursor(dictionary=True) as cursor:
+                select_query = f"SELECT {self.ID}, {column_name} FROM articles_info"
+                if state['watermark'] is not None:
+                    select_query += f" WHERE {self.ID} > {state['watermark']}"
+                select_query += f" ORDER BY {self.ID}"
+                with self.REPORT.stage('fetch') as record:
+                    cursor.execute(select_query)
+                    articles = cursor.fetchall()
+                    record['rows'] = len(articles)
+                print(f"Found {len(articles)} new records.")
                 
-                logging.info(f"Found {len(similar_pairs)} similar records.")
+                with self.REPORT.stage('similarity', len(articles)) as record:
+                    similar_pairs = strategy.find_new_pairs(state['index'], articles, column_name, self.ID)
+                    record['pairs'] = len(similar_pairs)
                 
-                record = 1
-                for pair in similar_pairs:
-                    logging.info(f"pair NO.{record}")
-                    logging.info(f"Similarity: {pair['id1']} and {pair['id2']}")
-                    # logging.info(f"Text 1: {pair['text1']}")
-                    # logging.info(f"Text 2: {pair['text2']}")
-                    logging.info("------")
-                    record += 1
+                self.log_pairs(similar_pairs)
                 
-                # delete similar records
-                for pair in similar_pairs:
-                    delete_query = f"DELETE FROM articles_info WHERE {self.ID} = {pair['id2']}"
-                    cursor.execute(delete_query)
-                    deleted_count += cursor.rowcount
+                # only the new rows are removed: a new row matching two indexed rows must not merge them
+                self.clusters = DuplicateClusters.from_matches(similar_pairs)
+                print(f"Found {len(self.clusters)} duplicate clusters.")
+                
+                duplicates = self.clusters.duplicates()
+                with self.REPORT.stage('delete', len(duplicates)):
+                    deleted_count = self.delete_duplicates(cursor, duplicates)
                 
             connection.commit()
+            
+            if articles:
+                state['watermark'] = articles[-1][self.ID]
+            with self.REPORT.stage('save_index', len(state['index'])):
+                DdProcessor.save_index_state(index_path, state)
         except Exception as e:
             print(f"Error: {e}")
             connection.rollback()
         
         end_time = time.time()
         total_time = end_time - start_time
+        self.REPORT.info['removed'] = deleted_count
         
-        print(f"Total records deleted: {deleted_count}")
-        print(f"Total time taken: {total_time} seconds")
\ No newline at end of file
+        print(f"Total records {'marked' if self.REMOVAL == 'mark' else 'deleted'}: {deleted_count}")
+        print(f"Total time taken: {total_time} seconds")
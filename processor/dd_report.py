@@ -0,0 +1,115 @@
+import os
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+class DdReport:
+    """
+    Per-stage instrumentation of a dedup run, written out as one JSON report.
+
+    Each stage records wall time, CPU time, the process peak RSS so far, and the
+    rows it handled with the resulting rows/sec. Stages nest, and callers can
+    add counters (candidates, pairs, ...) to the record yielded by stage().
+    With trace_memory=True the peak Python heap of every stage is measured with
+    tracemalloc, which slows allocation-heavy stages noticeably.
+
+    A disabled report hands out throwaway records and measures nothing, so
+    instrumented code does not need to check whether reporting is on.
+    """
+
+    def __init__(self, path=None, trace_memory=False, enabled=True):
+        self.path = path
+        self.trace_memory = trace_memory
+        self.enabled = enabled
+        self.started = time.time()
+        self.info = {}
+        self.stages = []
+        self.stack = []
+
+    @staticmethod
+    def peak_rss_mb():
+        if resource is None:
+            return None
+        # ru_maxrss is in kilobytes on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        record = {'stage': name, 'parent': self.stack[-1]['stage'] if self.stack else None, 'rows': rows}
+        if not self.enabled:
+            yield record
+            return
+
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        if tracing:
+            self.carry_peak()
+            record['peak_traced_mb'] = 0.0
+        self.stages.append(record)
+        self.stack.append(record)
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        finally:
+            record['wall_seconds'] = round(time.perf_counter() - wall, 6)
+            record['cpu_seconds'] = round(time.process_time() - cpu, 6)
+            record['peak_rss_mb'] = DdReport.peak_rss_mb()
+            if tracing:
+                self.carry_peak()
+            self.stack.pop()
+            if tracing and self.stack and 'peak_traced_mb' in self.stack[-1]:
+                self.stack[-1]['peak_traced_mb'] = max(self.stack[-1]['peak_traced_mb'], record['peak_traced_mb'])
+            if record['rows'] and record['wall_seconds'] > 0:
+                record['rows_per_sec'] = round(record['rows'] / record['wall_seconds'], 1)
+
+    def carry_peak(self):
+        # credit the heap peak since the last reset to the innermost open stage
+        peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        if self.stack and 'peak_traced_mb' in self.stack[-1]:
+            self.stack[-1]['peak_traced_mb'] = round(max(self.stack[-1]['peak_traced_mb'], peak), 3)
+        tracemalloc.reset_peak()
+
+    def start(self):
+        if self.enabled and self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def to_dict(self):
+        return {
+            'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+            'total_seconds': round(time.time() - self.started, 6),
+            'peak_rss_mb': DdReport.peak_rss_mb(),
+            'info': self.info,
+            'stages': self.stages,
+        }
+
+    def save(self, path=None):
+        path = path or self.path
+        if not self.enabled or not path:
+            return None
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+        print("------")
+        print(f"Run report has been written to {path}")
+        return path
+
+    @staticmethod
+    def from_config(reporting_config):
+        """
+        Builds the report of a [reporting] config section, a disabled one when reporting is off.
+        """
+        if not reporting_config or not reporting_config.getboolean('enabled', fallback=False):
+            return DdReport(enabled=False)
+        report = DdReport(trace_memory=reporting_config.getboolean('trace_memory', fallback=False))
+        directory = reporting_config.get('directory', fallback='./logs')
+        report.path = os.path.join(directory, f"{report.started}_report.json")
+        report.start()
+        return report
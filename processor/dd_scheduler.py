@@ -0,0 +1,152 @@
+import time
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+
+class Stage:
+    """
+    One step of a StagedScheduler.
+
+    An 'io' stage calls func in its own thread, which suits database fetches
+    and writes that wait on the network. A 'cpu' stage sends func to a process
+    pool with up to `workers` calls in flight, so func and its batches must be
+    picklable.
+    """
+
+    KINDS = ('io', 'cpu')
+
+    def __init__(self, name, func, kind='io', workers=1):
+        if kind not in Stage.KINDS:
+            raise ValueError(f"Unknown stage kind '{kind}', expected one of {Stage.KINDS}")
+        self.name = name
+        self.func = func
+        self.kind = kind
+        self.workers = max(workers, 1)
+
+
+class StagedScheduler:
+    """
+    Runs batches through a chain of stages connected by bounded queues.
+
+    The source is iterated in a feeder thread and every stage runs in its own
+    thread, so fetching batch N+2, hashing batch N+1 and consuming batch N
+    happen at once. A full queue blocks the stage feeding it, so a slow stage
+    throttles the ones before it and at most queue_size batches wait between
+    two stages. Results come out in source order. Wall time approaches the
+    slowest stage instead of the sum of all stages.
+
+    The first exception raised by the source or a stage stops every stage and
+    is re-raised to the consumer.
+    """
+
+    DONE = object()
+
+    def __init__(self, stages, queue_size=2, initializer=None):
+        self.stages = stages
+        self.queue_size = max(queue_size, 1)
+        self.initializer = initializer
+        self.stats = {}
+
+    def run(self, source):
+        stages = self.stages
+        queues = [queue.Queue(self.queue_size) for _ in range(len(stages) + 1)]
+        stop = threading.Event()
+        errors = []
+        self.stats = {stage.name: {'batches': 0, 'busy_seconds': 0.0} for stage in stages}
+        self.stats['source'] = {'batches': 0, 'busy_seconds': 0.0}
+
+        cpu_workers = sum(stage.workers for stage in stages if stage.kind == 'cpu')
+        executor = ProcessPoolExecutor(cpu_workers, initializer=self.initializer) if cpu_workers else None
+
+        def put(outbox, item):
+            # retry with a timeout so a stopped run never leaves a thread blocked on a full queue
+            while not stop.is_set():
+                try:
+                    outbox.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def get(inbox):
+            while not stop.is_set():
+                try:
+                    return inbox.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+            return StagedScheduler.DONE
+
+        def fail(error):
+            errors.append(error)
+            stop.set()
+
+        def feed():
+            stats = self.stats['source']
+            try:
+                items = iter(source)
+                while True:
+                    start = time.perf_counter()
+                    item = next(items, StagedScheduler.DONE)
+                    stats['busy_seconds'] += time.perf_counter() - start
+                    if item is StagedScheduler.DONE or not put(queues[0], item):
+                        break
+                    stats['batches'] += 1
+            except BaseException as e:
+                fail(e)
+            finally:
+                put(queues[0], StagedScheduler.DONE)
+
+        def work(stage, inbox, outbox):
+            stats = self.stats[stage.name]
+            pending = deque()
+
+            def emit(result):
+                stats['batches'] += 1
+                return put(outbox, result)
+
+            try:
+                while (item := get(inbox)) is not StagedScheduler.DONE:
+                    start = time.perf_counter()
+                    if stage.kind == 'io':
+                        result = stage.func(item)
+                        stats['busy_seconds'] += time.perf_counter() - start
+                        if not emit(result):
+                            return
+                        continue
+                    pending.append(executor.submit(stage.func, item))
+                    if len(pending) >= stage.workers:
+                        result = pending.popleft().result()
+                        stats['busy_seconds'] += time.perf_counter() - start
+                        if not emit(result):
+                            return
+                while pending:
+                    start = time.perf_counter()
+                    result = pending.popleft().result()
+                    stats['busy_seconds'] += time.perf_counter() - start
+                    if not emit(result):
+                        return
+            except BaseException as e:
+                fail(e)
+            finally:
+                put(outbox, StagedScheduler.DONE)
+
+        threads = [threading.Thread(target=feed, name='dd-source', daemon=True)]
+        for stage, inbox, outbox in zip(stages, queues, queues[1:]):
+            threads.append(threading.Thread(target=work, args=(stage, inbox, outbox), name=f'dd-{stage.name}', daemon=True))
+        for thread in threads:
+            thread.start()
+
+        try:
+            while (item := get(queues[-1])) is not StagedScheduler.DONE:
+                yield item
+        finally:
+            # also reached when the consumer stops early
+            stop.set()
+            for thread in threads:
+                thread.join()
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+        if errors:
+            raise errors[0]
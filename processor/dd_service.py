@@ -0,0 +1,228 @@
+import json
+import time
+import queue
+import threading
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .dd_processor import DdProcessor
+
+
+class DdService:
+    """
+    Resident dedup index answering per-document checks in memory.
+
+    The MinHash or SimHash index is loaded once (from snapshot_path when it
+    exists) and owned by a single worker thread. Calls from any number of
+    threads are queued; the worker drains up to max_batch of them, waiting at
+    most batch_window seconds for more, hashes all their texts in one batched
+    call and applies them in arrival order. The index is snapshotted to
+    snapshot_path every snapshot_interval seconds when it changed, and on
+    close.
+
+    Snapshots use the same format as DdProcessor.dd_incremental, so a service
+    can start from, and hand over to, an incremental index_path.
+    """
+
+    def __init__(self, method='minhash', threshold=0.7, column='title', snapshot_path=None, snapshot_interval=300, batch_window=0.005, max_batch=256, strategy_options=None):
+        self.threshold = threshold
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval = snapshot_interval
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+
+        self.processor = DdProcessor(threshold=threshold, method=method, strategy_options=strategy_options)
+        self.strategy = self.processor.create_strategy()
+        self.features = self.strategy.batch_features()
+        if self.features is None:
+            raise ValueError(f"The {method} method has no per-document index, use minhash or simhash")
+
+        state = DdProcessor.load_index_state(snapshot_path) if snapshot_path else None
+        if state is None:
+            state = {
+                'method': method,
+                'threshold': threshold,
+                'column': column,
+                'params': self.strategy.index_params,
+                'watermark': None,
+                'index': self.strategy.create_index(threshold),
+            }
+        elif (state['method'], state['threshold'], state['column'], state.get('params')) != (method, threshold, column, self.strategy.index_params):
+            raise ValueError(
+                f"Snapshot at {snapshot_path} was built with method={state['method']}, threshold={state['threshold']}, "
+                f"column={state['column']}, params={state.get('params')}; remove it to rebuild with the current settings"
+            )
+        self.state = state
+        print("------")
+        print(f"Dedup service loaded {len(state['index'])} indexed documents")
+
+        self.requests = queue.Queue()
+        # held while the index changes, so snapshots from other threads see a consistent index
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.last_snapshot = time.time()
+        self.stats = {'requests': 0, 'batches': 0, 'duplicates': 0, 'added': 0}
+        self.running = True
+        self.worker = threading.Thread(target=self.serve_requests, name='dd-service', daemon=True)
+        self.worker.start()
+
+    def submit(self, doc_id, text):
+        future = Future()
+        # close() stops under the same lock, so no request is queued after the worker's last drain
+        with self.lock:
+            if not self.running:
+                raise RuntimeError("The dedup service is closed")
+            self.requests.put((doc_id, text, future))
+        return future
+
+    def matches(self, text):
+        """
+        Returns the ids of indexed documents similar to text.
+        """
+        return self.submit(None, text).result()
+
+    def is_duplicate(self, text):
+        return bool(self.matches(text))
+
+    def add(self, doc_id, text):
+        """
+        Checks a new document and indexes it when it is not a duplicate.
+
+        Returns the ids it duplicates; as in incremental mode, only documents
+        without matches join the index.
+        """
+        return self.submit(doc_id, text).result()
+
+    def next_batch(self):
+        try:
+            batch = [self.requests.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        deadline = time.perf_counter() + self.batch_window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self.requests.get(timeout=remaining) if remaining > 0 else self.requests.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def serve_requests(self):
+        while self.running or not self.requests.empty():
+            batch = self.next_batch()
+            if batch:
+                self.apply(batch)
+            if self.dirty and time.time() - self.last_snapshot >= self.snapshot_interval:
+                self.snapshot()
+
+    def apply(self, batch):
+        try:
+            features = self.features([text for _, text, _ in batch])
+        except Exception as e:
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+
+        with self.lock:
+            self.apply_features(batch, features)
+        self.stats['requests'] += len(batch)
+        self.stats['batches'] += 1
+
+    def apply_features(self, batch, features):
+        index = self.state['index']
+        for (doc_id, text, future), feature in zip(batch, features):
+            try:
+                found = index.query(feature)
+                # as in incremental mode, a new document joins the index only when it is unique
+                if doc_id is not None and not found:
+                    index.insert(doc_id, feature)
+                    self.dirty = True
+                    self.stats['added'] += 1
+                if found:
+                    self.stats['duplicates'] += 1
+                future.set_result(found)
+            except Exception as e:
+                future.set_exception(e)
+
+    def snapshot(self):
+        with self.lock:
+            if self.snapshot_path:
+                DdProcessor.save_index_state(self.snapshot_path, self.state)
+            self.dirty = False
+            self.last_snapshot = time.time()
+
+    def close(self):
+        """
+        Answers the queued calls, stops the worker and writes a final snapshot.
+        """
+        with self.lock:
+            if not self.running:
+                return
+            self.running = False
+        self.worker.join()
+        if self.dirty:
+            self.snapshot()
+
+
+class DdServiceHandler(BaseHTTPRequestHandler):
+    """
+    JSON over HTTP front end of a DdService.
+
+    POST /is_duplicate {"text": ...} -> {"duplicate": bool, "matches": [ids]}
+    POST /add {"id": ..., "text": ...} -> {"duplicate": bool, "matches": [ids]}
+    POST /snapshot -> {"indexed": n}
+    GET /stats -> request counters and index size
+    """
+
+    service = None
+
+    def reply(self, status, body):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path != '/stats':
+            return self.reply(404, {'error': f"Unknown path {self.path}"})
+        self.reply(200, {**self.service.stats, 'indexed': len(self.service.state['index'])})
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            body = json.loads(self.rfile.read(length) or b'{}')
+            if self.path == '/is_duplicate':
+                matches = self.service.matches(body['text'])
+            elif self.path == '/add':
+                matches = self.service.add(body['id'], body['text'])
+            elif self.path == '/snapshot':
+                self.service.snapshot()
+                return self.reply(200, {'indexed': len(self.service.state['index'])})
+            else:
+                return self.reply(404, {'error': f"Unknown path {self.path}"})
+        except (KeyError, TypeError, ValueError) as e:
+            return self.reply(400, {'error': f"Bad request: {e}"})
+        self.reply(200, {'duplicate': bool(matches), 'matches': matches})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(service, host='127.0.0.1', port=8765):
+    """
+    Serves a DdService over HTTP until interrupted, then closes it.
+    """
+    handler = type('BoundDdServiceHandler', (DdServiceHandler,), {'service': service})
+    server = ThreadingHTTPServer((host, port), handler)
+    print("------")
+    print(f"Dedup service listening on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+        print("Dedup service stopped.")
@@ -0,0 +1,129 @@
+import os
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # parquet support is optional
+    pa = None
+    pq = None
+
+
+class FileStorage:
+    """
+    Storage backend reading articles from a CSV, JSONL, Parquet or Excel file instead of MySQL.
+
+    read_batches streams the input in chunk_size rows (Parquet through pyarrow
+    record batches, CSV and JSONL through the chunked pandas readers), so the
+    strategies' streaming mode never holds the whole file. Excel has no chunked
+    reader and is read at once. write_deduplicated makes a second streaming
+    pass over the input and writes every row that is not a duplicate.
+    """
+
+    FORMATS = {
+        '.csv': 'csv',
+        '.jsonl': 'jsonl',
+        '.json': 'jsonl',
+        '.parquet': 'parquet',
+        '.xlsx': 'excel',
+        '.xls': 'excel',
+    }
+
+    def __init__(self, input_path, chunk_size=5000):
+        self.input_path = input_path
+        self.chunk_size = chunk_size
+        self.format = FileStorage.file_format(input_path)
+
+    @staticmethod
+    def file_format(path):
+        extension = os.path.splitext(path)[1].lower()
+        if extension not in FileStorage.FORMATS:
+            raise ValueError(f"Unsupported file type '{extension}', expected one of {sorted(FileStorage.FORMATS)}")
+        file_format = FileStorage.FORMATS[extension]
+        if file_format == 'parquet' and pq is None:
+            raise ImportError("Reading or writing parquet files requires pyarrow")
+        return file_format
+
+    def read_frames(self, columns=None):
+        if self.format == 'csv':
+            yield from pd.read_csv(self.input_path, usecols=columns, chunksize=self.chunk_size)
+        elif self.format == 'jsonl':
+            for frame in pd.read_json(self.input_path, lines=True, chunksize=self.chunk_size):
+                yield frame[columns] if columns else frame
+        elif self.format == 'parquet':
+            for batch in pq.ParquetFile(self.input_path).iter_batches(batch_size=self.chunk_size, columns=columns):
+                yield batch.to_pandas()
+        else:
+            yield pd.read_excel(self.input_path, usecols=columns)
+
+    def read_batches(self, columns=None):
+        """
+        Yields the input as lists of row dicts, chunk_size rows at a time.
+        """
+        for frame in self.read_frames(columns):
+            # empty cells come back as NaN, the strategies expect text
+            yield frame.astype(object).where(frame.notna(), '').to_dict('records')
+
+    @staticmethod
+    def write_frames(path, frames):
+        """
+        Writes an iterable of DataFrames to one file, in the format given by the path's extension.
+        """
+        file_format = FileStorage.file_format(path)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        count = 0
+        if file_format == 'excel':
+            frames = list(frames)
+            df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+            df.to_excel(path, index=False)
+            return len(df)
+
+        parquet_writer = None
+        with open(path, 'wb') as f:
+            for frame in frames:
+                if file_format == 'csv':
+                    f.write(frame.to_csv(index=False, header=f.tell() == 0).encode('utf-8'))
+                elif file_format == 'jsonl':
+                    if len(frame):
+                        f.write(frame.to_json(orient='records', lines=True, force_ascii=False).rstrip('\n').encode('utf-8') + b'\n')
+                else:
+                    table = pa.Table.from_pandas(frame, preserve_index=False)
+                    if parquet_writer is None:
+                        parquet_writer = pq.ParquetWriter(f, table.schema)
+                    parquet_writer.write_table(table)
+                count += len(frame)
+            if parquet_writer is not None:
+                parquet_writer.close()
+        return count
+
+    def write_deduplicated(self, output_path, duplicates, id='id', removal='delete'):
+        """
+        Copies the input to output_path without the duplicate rows.
+
+        duplicates maps each duplicate id to its survivor, as returned by
+        DuplicateClusters.duplicates(). With removal='mark' every row is kept
+        and a dup_of column holds the survivor id of the duplicates instead.
+        """
+        def frames():
+            for frame in self.read_frames():
+                if removal == 'mark':
+                    frame = frame.assign(dup_of=frame[id].map(duplicates).astype('Int64'))
+                else:
+                    frame = frame[~frame[id].isin(duplicates.keys())]
+                yield frame
+
+        count = FileStorage.write_frames(output_path, frames())
+        print("------")
+        print(f"{count} rows have been written to {output_path}")
+        return count
+
+    @staticmethod
+    def write_pairs(path, similar_pairs):
+        # the substring check and the strategy can both report a pair
+        pairs = pd.DataFrame(similar_pairs, columns=['id1', 'id2']).drop_duplicates()
+        FileStorage.write_frames(path, [pairs])
+        print("------")
+        print(f"{len(pairs)} duplicate pairs have been written to {path}")
@@ -1,7 +1,76 @@
 # similarity_strategy.py
 from abc import ABC, abstractmethod
+from .dd_report import DdReport
 
 class SimilarityStrategy(ABC):
+    def __init__(self, workers=1, cache=None, tokenizer='jieba', shingle_k=2, report=None):
+        self.workers = workers
+        self.tokenizer = tokenizer
+        self.shingle_k = shingle_k
+        self.cache = cache
+        self.report = report if report is not None else DdReport(enabled=False)
+        self.pool = None
+        # describes how index entries are computed; persisted indexes are only reused when it matches
+        self.index_params = None
+
     @abstractmethod
     def find_similar_pairs(self, articles, column_name, threshold, id = 'id', sub_string = True):
-        pass
\ No newline at end of file
+        pass
+
+    def find_similar_pairs_streaming(self, batches, column_name, threshold, id = 'id'):
+        """
+        Finds similar pairs over an iterable of article batches.
+
+        Strategies that can index incrementally override this to keep only the
+        index and one batch in memory; the default collects every batch first.
+        """
+        articles = [article for batch in batches for article in batch]
+        return self.find_similar_pairs(articles, column_name, threshold, id, sub_string=False)
+
+    def batch_features(self):
+        """
+        Returns a picklable callable turning a list of texts into their index entries, or None.
+
+        Strategies returning one can have that work run in a process pool by
+        the staged scheduler, then fed to index_batch in order.
+        """
+        return None
+
+    def feature_cache_key(self):
+        """
+        Returns the (kind, params) the results of batch_features are cached under, or None.
+        """
+        return None
+
+    def index_batch(self, index, ids, features, similar_pairs):
+        """
+        Queries one batch of index entries against the index, then inserts them.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support pipelined mode")
+
+    def distributed_bands(self, threshold):
+        """
+        Returns the bands DistributedDedup partitions candidate generation by, or None.
+        """
+        return None
+
+    def create_stream_index(self, threshold):
+        """
+        Returns the index of the streaming and pipelined modes, create_index unless overridden.
+        """
+        return self.create_index(threshold)
+
+    def finish_index(self, index, similar_pairs):
+        """
+        Adds the pairs of an index that only finds them once every batch is inserted.
+        """
+        pass
+
+    def create_index(self, threshold):
+        raise NotImplementedError(f"{type(self).__name__} does not support incremental mode")
+
+    def find_new_pairs(self, index, articles, column_name, id = 'id'):
+        """
+        Queries new articles against a persisted index and inserts the non-duplicates.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support incremental mode")
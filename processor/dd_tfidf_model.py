@@ -0,0 +1,158 @@
+import os
+import json
+import time
+import hashlib
+import numpy as np
+from scipy.sparse import diags
+from sklearn.feature_extraction.text import CountVectorizer, HashingVectorizer, TfidfTransformer
+from sklearn.preprocessing import normalize
+
+
+class TfidfModel:
+    """
+    TF-IDF vocabulary and IDF weights fitted once on a reference corpus and reused across runs.
+
+    transform() only counts terms against the stored vocabulary, so scores do
+    not drift with the batch being deduplicated and no fitting pass is needed.
+    Texts are passed in already prepared by TfidfSimilarity: space separated
+    jieba words, or normalized text split into char_wb shingles of length
+    shingle_k. Stopwords are dropped before counting, and term_weights
+    multiplies the IDF of the given terms (e.g. to damp boilerplate words).
+
+    With hashing=True terms are hashed into n_features columns instead of
+    looked up in a vocabulary: memory stays constant whatever the corpus,
+    and an unfitted hashing model is stateless (plain term frequencies).
+
+    save() writes a directory with model.json (format, version, parameters,
+    stopwords, term weights), vocabulary.json and idf.npy; load() memory-maps
+    idf.npy. version is a digest of the fitted state, so runs can record which
+    model scored them.
+    """
+
+    FORMAT = 1
+
+    def __init__(self, tokenizer='jieba', shingle_k=2, stopwords=None, term_weights=None, hashing=False, n_features=2 ** 20):
+        self.tokenizer = tokenizer
+        self.shingle_k = shingle_k
+        self.stopwords = sorted(set(stopwords or ()))
+        self.term_weights = dict(term_weights or {})
+        self.hashing = hashing
+        self.n_features = n_features
+        self.vocabulary = None
+        self.idf = None
+        self.documents = 0
+        self.version = None
+
+    def preprocess(self, text):
+        # char shingles have no words for sklearn's stop_words to drop, remove the stopwords from the text
+        text = text.lower()
+        for stopword in self.stopwords:
+            text = text.replace(stopword, '')
+        return text
+
+    def vectorizer(self):
+        if self.tokenizer == 'char':
+            options = {'analyzer': 'char_wb', 'ngram_range': (self.shingle_k, self.shingle_k), 'preprocessor': self.preprocess}
+        else:
+            options = {'stop_words': self.stopwords or None}
+        if self.hashing:
+            return HashingVectorizer(n_features=self.n_features, alternate_sign=False, norm=None, **options)
+        return CountVectorizer(vocabulary=self.vocabulary, **options)
+
+    def term_columns(self, terms):
+        if not self.hashing:
+            return [self.vocabulary.get(term) for term in terms]
+        # hash the terms themselves, not the shingles or words an analyzer would cut them into
+        hasher = HashingVectorizer(n_features=self.n_features, alternate_sign=False, norm=None, analyzer=lambda term: [term])
+        return [int(row.indices[0]) for row in hasher.transform(terms)]
+
+    def fit(self, texts):
+        """
+        Learns the vocabulary (unless hashing) and the IDF weights from prepared texts.
+        """
+        vectorizer = self.vectorizer()
+        counts = vectorizer.transform(texts) if self.hashing else vectorizer.fit_transform(texts)
+        if not self.hashing:
+            self.vocabulary = {term: int(column) for term, column in vectorizer.vocabulary_.items()}
+        # same smoothed idf as TfidfVectorizer
+        self.idf = TfidfTransformer().fit(counts).idf_
+        self.documents = counts.shape[0]
+        self.version = self.digest()
+        return self
+
+    def weights(self):
+        """
+        Returns the per-column weights: the IDF times the custom term weights.
+        """
+        width = self.n_features if self.hashing else len(self.vocabulary)
+        weights = np.array(self.idf, dtype=np.float64) if self.idf is not None else np.ones(width)
+        if self.term_weights:
+            for column, weight in zip(self.term_columns(list(self.term_weights)), self.term_weights.values()):
+                if column is not None:
+                    weights[column] *= weight
+        return weights
+
+    def transform(self, texts):
+        """
+        Returns the L2-normalized TF-IDF rows of prepared texts as a CSR matrix.
+        """
+        if self.vocabulary is None and not self.hashing:
+            raise ValueError("The TF-IDF model is not fitted")
+        counts = self.vectorizer().transform(texts)
+        return normalize(counts @ diags(self.weights()), norm='l2', copy=False).tocsr()
+
+    def params(self):
+        return {
+            'tokenizer': self.tokenizer,
+            'shingle_k': self.shingle_k,
+            'hashing': self.hashing,
+            'n_features': self.n_features,
+        }
+
+    def digest(self):
+        state = hashlib.sha1(json.dumps([self.params(), self.stopwords, self.term_weights], ensure_ascii=False, sort_keys=True).encode('utf-8'))
+        if self.vocabulary is not None:
+            state.update(json.dumps(sorted(self.vocabulary.items()), ensure_ascii=False).encode('utf-8'))
+        if self.idf is not None:
+            state.update(np.ascontiguousarray(self.idf, dtype=np.float64).tobytes())
+        return state.hexdigest()[:12]
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        self.version = self.digest()
+        if self.idf is not None:
+            np.save(os.path.join(path, 'idf.npy'), np.asarray(self.idf, dtype=np.float64))
+        if self.vocabulary is not None:
+            with open(os.path.join(path, 'vocabulary.json'), 'w', encoding='utf-8') as f:
+                json.dump(self.vocabulary, f, ensure_ascii=False)
+        with open(os.path.join(path, 'model.json'), 'w', encoding='utf-8') as f:
+            json.dump({
+                'format': TfidfModel.FORMAT,
+                'version': self.version,
+                'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'documents': self.documents,
+                **self.params(),
+                'stopwords': self.stopwords,
+                'term_weights': self.term_weights,
+            }, f, ensure_ascii=False, indent=2)
+        print("------")
+        print(f"TF-IDF model {self.version} has been saved to {path}")
+
+    @classmethod
+    def load(cls, path):
+        with open(os.path.join(path, 'model.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('format') != TfidfModel.FORMAT:
+            raise ValueError(f"TF-IDF model at {path} has format {meta.get('format')}, expected {TfidfModel.FORMAT}; refit it")
+
+        model = cls(meta['tokenizer'], meta['shingle_k'], meta['stopwords'], meta['term_weights'], meta['hashing'], meta['n_features'])
+        model.documents = meta['documents']
+        model.version = meta['version']
+        idf_path = os.path.join(path, 'idf.npy')
+        if os.path.exists(idf_path):
+            model.idf = np.load(idf_path, mmap_mode='r')
+        vocabulary_path = os.path.join(path, 'vocabulary.json')
+        if os.path.exists(vocabulary_path):
+            with open(vocabulary_path, encoding='utf-8') as f:
+                model.vocabulary = json.load(f)
+        return model
@@ -0,0 +1,24 @@
+from benchmark.corpus import SyntheticCorpus
+
+
+def test_corpus_is_reproducible():
+    first = SyntheticCorpus(300, seed=3)
+    second = SyntheticCorpus(300, seed=3)
+
+    assert first.articles == second.articles
+    assert len({article['id'] for article in first.articles}) == 300
+    assert first.true_pair_count() > 0
+
+
+def test_score_counts_transitive_pairs():
+    corpus = SyntheticCorpus(200, dup_rate=0.3, seed=1)
+    truth = [
+        {'id1': corpus.clusters[doc_id], 'id2': doc_id}
+        for doc_id in corpus.clusters
+        if corpus.clusters[doc_id] != doc_id
+    ]
+
+    assert corpus.score(truth) == {'precision': 1.0, 'recall': 1.0}
+    assert corpus.score([])['recall'] == 0.0
+    other = next(doc_id for doc_id in corpus.clusters if corpus.clusters[doc_id] != corpus.clusters[1])
+    assert corpus.score(truth + [{'id1': 1, 'id2': other}])['precision'] < 1.0
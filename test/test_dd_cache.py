@@ -0,0 +1,34 @@
+from processor.dd_cache import DdCache
+
+
+def test_get_or_compute_only_computes_misses(tmp_path):
+    cache = DdCache(str(tmp_path / 'cache.sqlite3'))
+    calls = []
+
+    def compute(indices):
+        calls.append(list(indices))
+        return [texts[i].upper() for i in indices]
+
+    texts = ['a', 'b', 'a']
+    assert cache.get_or_compute('upper', 'v1', texts, compute) == ['A', 'B', 'A']
+    texts = ['a', 'c']
+    assert cache.get_or_compute('upper', 'v1', texts, compute) == ['A', 'C']
+    assert calls == [[0, 1, 2], [1]]
+
+    # other parameters never share entries
+    texts = ['a']
+    cache.get_or_compute('upper', 'v2', texts, compute)
+    assert calls[-1] == [0]
+    cache.close()
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = DdCache(str(tmp_path / 'cache.sqlite3'), max_entries=2)
+    cache.put_many([(DdCache.key('k', '', 'a'), 1)])
+    cache.put_many([(DdCache.key('k', '', 'b'), 2)])
+    cache.get_many([DdCache.key('k', '', 'a')])
+    cache.put_many([(DdCache.key('k', '', 'c'), 3)])
+
+    keys = [DdCache.key('k', '', text) for text in 'abc']
+    assert set(cache.get_many(keys)) == {keys[0], keys[2]}
+    cache.close()
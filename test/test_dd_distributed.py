@@ -0,0 +1,65 @@
+import numpy as np
+
+from processor.dd_algorithm import MinHashSimilarity, SimhashSimilarity
+from processor.dd_cache import DdCache
+from processor.dd_distributed import DistributedDedup, map_batch, reduce_partition
+
+
+TITLES = [
+    '比特币失手5万美元大关',
+    '今日天气晴朗适合出游',
+    '比特币失手5万美元大关！',
+    '央行宣布下调存款准备金率',
+    '今日天气晴朗，适合出游',
+    '央行宣布下调存款准备金率0.5个百分点',
+]
+
+
+def in_memory_pairs(strategy, threshold=0.7):
+    index = strategy.create_index(threshold)
+    pairs = []
+    strategy.index_batch(index, list(range(len(TITLES))), strategy.batch_features()(TITLES), pairs)
+    return sorted((pair['id1'], pair['id2']) for pair in pairs)
+
+
+def test_map_reduce_matches_in_memory_index(tmp_path):
+    for strategy in (MinHashSimilarity(tokenizer='char'), SimhashSimilarity(tokenizer='char')):
+        bands = strategy.distributed_bands(0.7)
+        for batch, start in enumerate(range(0, len(TITLES), 2)):
+            map_batch(strategy.batch_features(), bands, str(tmp_path), 3, batch, list(range(start, start + 2)), TITLES[start:start + 2])
+
+        pairs = set()
+        for partition in range(3):
+            reduce_partition(bands, str(tmp_path), partition, 3)
+            pairs.update(map(tuple, np.load(tmp_path / f'pairs_{partition}.npy').tolist()))
+
+        assert sorted(pairs) == in_memory_pairs(strategy)
+
+
+def test_distributed_workers_share_work_directory(tmp_path):
+    strategy = MinHashSimilarity(tokenizer='char')
+    batches = [[{'id': i, 'title': TITLES[i]} for i in range(start, start + 3)] for start in (0, 3)]
+
+    dedup = DistributedDedup(strategy.batch_features(), strategy.distributed_bands(0.7), workers=2, directory=str(tmp_path))
+    pairs = dedup.find_similar_pairs(iter(batches), 'title')
+
+    assert sorted((pair['id1'], pair['id2']) for pair in pairs) == in_memory_pairs(strategy)
+    assert dedup.stats['rows'] == len(TITLES)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_distributed_workers_only_hash_cache_misses(tmp_path):
+    strategy = MinHashSimilarity(tokenizer='char')
+    cache = DdCache(str(tmp_path / 'cache.sqlite3'))
+    cache.get_or_compute(*strategy.feature_cache_key(), TITLES[:3], lambda missing: strategy.batch_features()([TITLES[i] for i in missing]))
+    batches = [[{'id': i, 'title': TITLES[i]} for i in range(start, start + 3)] for start in (0, 3)]
+
+    dedup = DistributedDedup(
+        strategy.batch_features(), strategy.distributed_bands(0.7), workers=2, directory=str(tmp_path / 'shuffle'),
+        cache=cache, cache_key=strategy.feature_cache_key()
+    )
+    pairs = dedup.find_similar_pairs(iter(batches), 'title')
+
+    assert sorted((pair['id1'], pair['id2']) for pair in pairs) == in_memory_pairs(strategy)
+    assert (cache.hits, cache.misses) == (3, 6)
+    assert len(cache) == len(TITLES)
@@ -0,0 +1,44 @@
+from processor.dd_cluster import DuplicateClusters
+from processor.dd_processor import DdProcessor
+
+
+class FakeCursor:
+    def __init__(self):
+        self.queries = []
+        self.rowcount = 0
+
+    def execute(self, query, params=()):
+        self.queries.append((query, params))
+        self.rowcount = len(params)
+
+
+def test_clusters_keep_one_row_of_symmetric_pairs():
+    pairs = [{'id1': 1, 'id2': 2}, {'id1': 2, 'id2': 1}, {'id1': 3, 'id2': 3}, {'id1': 1, 'id2': 4}]
+
+    assert DuplicateClusters(pairs).duplicates() == {2: 1, 4: 1}
+
+
+def test_chains_form_one_cluster():
+    pairs = [{'id1': 5, 'id2': 3}, {'id1': 3, 'id2': 9}, {'id1': 7, 'id2': 8}]
+    lengths = {3: 2, 5: 4, 9: 3, 7: 1, 8: 1}
+
+    lowest = DuplicateClusters(pairs)
+    assert lowest.duplicates() == {5: 3, 9: 3, 8: 7}
+
+    longest = DuplicateClusters(pairs, 'longest_text', lengths)
+    assert longest.duplicates() == {3: 5, 9: 5, 8: 7}
+    assert [row['cluster_id'] for row in longest.rows()] == [5, 5, 5, 7, 7]
+
+
+def test_delete_duplicates_uses_batched_in_lists():
+    processor = DdProcessor(batch_size=2)
+    cursor = FakeCursor()
+    duplicates = DuplicateClusters([{'id1': 1, 'id2': i} for i in range(2, 7)]).duplicates()
+
+    assert processor.delete_duplicates(cursor, duplicates) == 5
+    assert [params for _, params in cursor.queries] == [(2, 3), (4, 5), (6,)]
+
+
+def test_parse_columns_reads_weighted_fields():
+    assert DdProcessor.parse_columns("title") == "title"
+    assert DdProcessor.parse_columns("title:0.4, content:0.6") == {'title': 0.4, 'content': 0.6}
@@ -0,0 +1,38 @@
+import json
+
+from processor.dd_algorithm import MinHashSimilarity
+from processor.dd_report import DdReport
+
+
+def test_stages_nest_and_save_as_json(tmp_path):
+    report = DdReport(path=str(tmp_path / 'report.json'))
+    with report.stage('process'):
+        with report.stage('hash', rows=100) as record:
+            record['candidates'] = 7
+
+    assert [(stage['stage'], stage['parent']) for stage in report.stages] == [('process', None), ('hash', 'process')]
+    assert report.stages[1]['candidates'] == 7
+    assert report.stages[1]['wall_seconds'] >= 0
+
+    saved = json.loads(open(report.save(), encoding='utf-8').read())
+    assert [stage['stage'] for stage in saved['stages']] == ['process', 'hash']
+
+
+def test_strategy_reports_its_stages():
+    report = DdReport()
+    articles = [{'id': i, 'title': title} for i, title in enumerate(['比特币失手5万美元大关', '比特币失手5万美元大关！', '今日天气晴朗'])]
+    pairs = MinHashSimilarity(report=report).find_similar_pairs(articles, 'title', 0.7, 'id')
+
+    stages = {stage['stage']: stage for stage in report.stages}
+    assert {'substring', 'tokenize', 'hash', 'index', 'query'} <= set(stages)
+    assert stages['query']['candidates'] >= stages['query']['pairs']
+    assert len(pairs) == stages['substring']['pairs'] + stages['query']['pairs']
+
+
+def test_disabled_report_records_nothing():
+    report = DdReport(enabled=False)
+    with report.stage('load', rows=5) as record:
+        record['pairs'] = 1
+
+    assert report.stages == []
+    assert report.save() is None
@@ -0,0 +1,54 @@
+import pytest
+
+from processor.dd_algorithm import MinHashSimilarity
+from processor.dd_cache import DdCache
+from processor.dd_processor import DdProcessor
+from processor.dd_scheduler import Stage, StagedScheduler
+
+
+def square_all(batch):
+    return [x * x for x in batch]
+
+
+def test_stages_keep_source_order():
+    scheduler = StagedScheduler([
+        Stage('square', square_all, kind='cpu', workers=2),
+        Stage('total', sum),
+    ], queue_size=1)
+
+    assert list(scheduler.run([[i, i + 1] for i in range(20)])) == [i * i + (i + 1) * (i + 1) for i in range(20)]
+    assert scheduler.stats['total']['batches'] == 20
+
+
+def test_errors_reach_the_consumer():
+    def source():
+        yield [1]
+        raise RuntimeError("fetch failed")
+
+    with pytest.raises(RuntimeError, match="fetch failed"):
+        list(StagedScheduler([Stage('total', sum)]).run(source()))
+
+
+TITLES = ['比特币失手5万美元大关', '今日天气晴朗适合出游', '比特币失手5万美元大关！', '央行宣布降准0.5个百分点', '今日天气晴朗适合出游！']
+
+
+def test_pipelined_pairs_match_streaming():
+    batches = [[{'id': i + 1, 'title': title} for i, title in enumerate(TITLES)][start:start + 2] for start in range(0, 5, 2)]
+
+    processor = DdProcessor(method='minhash', workers=2, pipeline=True)
+    pipelined = processor.pipelined_pairs(processor.create_strategy(), iter(batches), 'title')
+    streamed = MinHashSimilarity().find_similar_pairs_streaming(iter(batches), 'title', 0.7)
+
+    assert pipelined == streamed
+
+
+def test_cached_pipeline_only_hashes_misses(tmp_path):
+    batches = [[{'id': i + 1, 'title': title} for i, title in enumerate(TITLES)][start:start + 2] for start in range(0, 5, 2)]
+    streamed = MinHashSimilarity().find_similar_pairs_streaming(iter(batches), 'title', 0.7)
+    cache = DdCache(str(tmp_path / 'cache.sqlite3'))
+
+    for hits in (0, len(TITLES)):
+        processor = DdProcessor(method='minhash', workers=2, pipeline=True, cache=cache)
+        assert processor.pipelined_pairs(processor.create_strategy(), iter(batches), 'title') == streamed
+        assert cache.hits == hits
+    assert cache.misses == len(TITLES)
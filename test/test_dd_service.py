@@ -0,0 +1,62 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from processor.dd_processor import DdProcessor
+from processor.dd_service import DdService, DdServiceHandler
+
+
+def test_add_and_check(tmp_path):
+    snapshot = str(tmp_path / 'index.pkl')
+    service = DdService(method='minhash', snapshot_path=snapshot, batch_window=0.01)
+
+    assert service.add(1, '比特币失手5万美元大关') == []
+    assert service.add(2, '比特币失手5万美元大关！') == [1]
+    assert service.is_duplicate('比特币失手5万美元大关')
+    assert not service.is_duplicate('今日天气晴朗适合出游')
+    service.close()
+
+    state = DdProcessor.load_index_state(snapshot)
+    assert list(state['index'].signatures) == [1]
+
+
+def test_concurrent_calls_are_batched():
+    service = DdService(method='simhash', batch_window=0.05)
+    titles = [f'第{i}条新闻标题内容各不相同{i * 7919}' for i in range(64)]
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        results = list(executor.map(lambda i: service.add(i, titles[i]), range(64)))
+    service.close()
+
+    assert service.stats['requests'] == 64
+    assert service.stats['batches'] < 64
+    assert sum(1 for matches in results if not matches) == service.stats['added']
+
+
+def test_closed_service_rejects_calls():
+    service = DdService(method='simhash', batch_window=0.01)
+    service.close()
+
+    with pytest.raises(RuntimeError, match="closed"):
+        service.is_duplicate('比特币失手5万美元大关')
+
+
+def test_malformed_body_is_a_bad_request():
+    service = DdService(method='simhash', batch_window=0.01)
+    handler = type('BoundDdServiceHandler', (DdServiceHandler,), {'service': service})
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        request = urllib.request.Request(f'http://127.0.0.1:{server.server_port}/is_duplicate', data=json.dumps(['text']).encode('utf-8'))
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(request)
+        assert error.value.code == 400
+    finally:
+        server.shutdown()
+        server.server_close()
+        service.close()
@@ -0,0 +1,34 @@
+import json
+
+import pandas as pd
+
+from processor.dd_processor import DdProcessor
+from processor.dd_storage import FileStorage
+
+
+TITLES = ['比特币失手5万美元大关', '今日天气晴朗适合出游', '比特币失手5万美元大关！', '央行宣布降准0.5个百分点', None]
+
+
+def test_file_dedup_drops_duplicates_and_writes_pairs(tmp_path):
+    input_path = tmp_path / 'articles.csv'
+    pd.DataFrame({'id': range(1, 6), 'title': TITLES, 'source': list('abcde')}).to_csv(input_path, index=False)
+
+    processor = DdProcessor(threshold=0.7, method='minhash')
+    processor.dd_file(FileStorage(str(input_path), chunk_size=2), 'title', str(tmp_path / 'out.jsonl'), str(tmp_path / 'pairs.csv'))
+
+    rows = [json.loads(line) for line in open(tmp_path / 'out.jsonl', encoding='utf-8')]
+    assert [row['id'] for row in rows] == [1, 2, 4, 5]
+    assert rows[0]['source'] == 'a'
+    assert pd.read_csv(tmp_path / 'pairs.csv').to_dict('records') == [{'id1': 1, 'id2': 3}]
+
+
+def test_mark_keeps_every_row(tmp_path):
+    input_path = tmp_path / 'articles.jsonl'
+    pd.DataFrame({'id': range(1, 6), 'title': TITLES}).to_json(input_path, orient='records', lines=True, force_ascii=False)
+
+    storage = FileStorage(str(input_path), chunk_size=2)
+    storage.write_deduplicated(str(tmp_path / 'out.csv'), {3: 1}, removal='mark')
+
+    out = pd.read_csv(tmp_path / 'out.csv')
+    assert out['id'].tolist() == [1, 2, 3, 4, 5]
+    assert out['dup_of'].fillna(0).tolist() == [0, 0, 1, 0, 0]
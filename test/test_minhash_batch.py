@@ -0,0 +1,49 @@
+import random
+
+import numpy as np
+
+from processor.dd_algorithm import Minhash
+from processor.dd_index import MinHashIndex
+
+
+def test_signatures_estimate_jaccard():
+    rng = random.Random(3)
+    vocab = [f"token{i}" for i in range(2000)]
+    permutations = Minhash.permutations(256, seed=1)
+
+    for _ in range(20):
+        a = set(rng.sample(vocab, 40))
+        b = set(rng.sample(sorted(a), 25)) | set(rng.sample(vocab, 10))
+        signatures = Minhash.signatures_batch([sorted(a), sorted(b)], permutations)
+
+        estimate = np.mean(signatures[0] == signatures[1])
+        assert abs(estimate - len(a & b) / len(a | b)) < 0.15
+
+
+def test_chunking_and_empty_documents():
+    permutations = Minhash.permutations(16, seed=7)
+    docs = [['a', 'b'], [], ['b', 'c', 'b'], [], ['a']]
+
+    chunked = Minhash.signatures_batch(docs, permutations, chunk_size=2)
+    whole = Minhash.signatures_batch(docs, permutations)
+
+    assert chunked.dtype == np.uint32 and chunked.shape == (5, 16)
+    assert (chunked == whole).all()
+    assert (chunked[1] == Minhash.MAX_HASH).all() and (chunked[3] == Minhash.MAX_HASH).all()
+    assert (chunked[0] == np.minimum(chunked[4], Minhash.signatures_batch([['b']], permutations)[0])).all()
+
+
+def test_index_verifies_lsh_candidates():
+    rng = np.random.RandomState(0)
+    a = rng.randint(0, 1 << 32, 128, dtype=np.uint64).astype(np.uint32)
+    b = rng.randint(0, 1 << 32, 128, dtype=np.uint64).astype(np.uint32)
+    b[:4] = a[:4]
+
+    unverified = MinHashIndex(0.5, bands=32, rows=4, verify=False)
+    verified = MinHashIndex(0.5, bands=32, rows=4)
+    for index in (unverified, verified):
+        index.insert_many(['a'], [a])
+
+    assert unverified.query(b) == ['a']
+    assert verified.query(b) == []
+    assert verified.query(a) == ['a']
@@ -0,0 +1,53 @@
+import random
+
+from processor.dd_algorithm import MultiFieldSimilarity
+
+
+WEIGHTS = {'title': 0.4, 'content': 0.6}
+
+
+def content(rng):
+    return ''.join(chr(rng.randrange(0x4e00, 0x9fa5)) for _ in range(60))
+
+
+def test_same_title_with_unrelated_content_is_not_a_duplicate():
+    rng = random.Random(0)
+    strategy = MultiFieldSimilarity(tokenizer='char')
+    flagged = 0
+    for k in range(20):
+        articles = [
+            {'id': 1, 'title': f'第{k}条新闻标题完全相同', 'content': content(rng)},
+            {'id': 2, 'title': f'第{k}条新闻标题完全相同', 'content': content(rng)},
+        ]
+        flagged += len(strategy.find_similar_pairs(articles, WEIGHTS, 0.7, 'id'))
+    assert flagged == 0
+
+
+def test_contained_title_still_needs_similar_content():
+    rng = random.Random(1)
+    text = content(rng)
+    articles = [
+        {'id': 1, 'title': '比特币失手5万美元大关', 'content': text},
+        {'id': 2, 'title': '比特币失手5万美元大关！分析师解读', 'content': text},
+        {'id': 3, 'title': '比特币失手5万美元大关', 'content': content(rng)},
+    ]
+
+    pairs = MultiFieldSimilarity(tokenizer='char').find_similar_pairs(articles, WEIGHTS, 0.7, 'id')
+
+    assert pairs == [{'id1': 1, 'id2': 2}]
+
+
+def test_identical_content_rescues_a_moderately_similar_title():
+    rng = random.Random(2)
+    text = ''.join(content(rng) for _ in range(4))[:200]
+    articles = [
+        {'id': 1, 'title': '央行宣布下调存款准备金率', 'content': text},
+        {'id': 2, 'title': '央行宣布下调存款利率半个百分点', 'content': text},
+    ]
+
+    strategy = MultiFieldSimilarity(tokenizer='char')
+    signatures = strategy.blocking.signatures([article['title'] for article in articles])
+    # 0.4 * title + 0.6 * content passes 0.7 although the title alone does not
+    assert 0.3 < (signatures[0] == signatures[1]).mean() < 0.6
+
+    assert strategy.find_similar_pairs(articles, WEIGHTS, 0.7, 'id') == [{'id1': 1, 'id2': 2}]
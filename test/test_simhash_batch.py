@@ -0,0 +1,16 @@
+from processor.dd_algorithm import ProcessTools, Simhash
+
+
+def test_md5_batch_matches_simhash_128():
+    texts = [
+        "工银投资成立绿能股权投资合伙企业 出资额75亿",
+        "工银于近日投资成立了绿能股权投资合伙企业 出资额75亿",
+        "比特币失手51000美元/枚，日内跌幅12.42%。",
+        "",
+    ]
+    tokens = [ProcessTools.chinese_tokenizer(text, type='list') for text in texts]
+
+    fingerprints = Simhash.simhash_128_batch(tokens, hash_func='md5', chunk_size=3)
+
+    assert fingerprints.shape == (len(texts), 2)
+    assert [Simhash.to_int(fp) for fp in fingerprints] == [Simhash.simhash_128(text) for text in texts]
@@ -0,0 +1,90 @@
+import random
+
+import pytest
+
+from processor.db_mysql_utils import DatabaseUtils
+from processor.dd_algorithm import Simhash
+from processor.dd_index import SimhashIndex
+
+
+def brute_force(fingerprints, max_distance):
+    pairs = set()
+    for i in range(len(fingerprints)):
+        for j in range(i + 1, len(fingerprints)):
+            if bin(fingerprints[i] ^ fingerprints[j]).count('1') <= max_distance:
+                pairs.add((i, j))
+    return pairs
+
+
+def test_max_distance_matches_similarity():
+    for threshold in (0.7, 0.75, 0.9, 0.95):
+        d = Simhash.max_distance(threshold)
+        assert 1 - d / 128 > threshold
+        assert not 1 - (d + 1) / 128 > threshold
+
+
+def test_index_matches_brute_force():
+    rng = random.Random(7)
+    base = [rng.getrandbits(128) for _ in range(20)]
+    fingerprints = []
+    for fp in base:
+        fingerprints.append(fp)
+        for _ in range(3):
+            noisy = fp
+            for bit in rng.sample(range(128), rng.randint(0, 8)):
+                noisy ^= 1 << bit
+            fingerprints.append(noisy)
+
+    index = SimhashIndex(max_distance=6)
+    pairs = set()
+    for j, fp in enumerate(fingerprints):
+        for i in index.query(fp):
+            pairs.add((i, j))
+        index.add(j, fp)
+
+    assert pairs == brute_force(fingerprints, 6)
+
+
+def test_rows_round_trip():
+    rng = random.Random(1)
+    index = SimhashIndex(max_distance=3)
+    for i in range(10):
+        index.add(i, rng.getrandbits(128))
+
+    rows = index.to_rows()
+    assert all(len(row) == index.blocks + 1 for row in rows)
+
+    reloaded = SimhashIndex.from_rows(rows, max_distance=3)
+    assert reloaded.fingerprints == index.fingerprints
+
+
+def test_narrow_blocks_scan_every_fingerprint():
+    rng = random.Random(3)
+    base = [rng.getrandbits(128) for _ in range(30)]
+    fingerprints = base + [fp ^ sum(1 << bit for bit in rng.sample(range(128), 30)) for fp in base]
+
+    index = SimhashIndex(max_distance=38)
+    assert index.scan
+    pairs = set()
+    for j, fp in enumerate(fingerprints):
+        for i in index.query(fp):
+            pairs.add((i, j))
+        index.add(j, fp)
+
+    assert pairs == brute_force(fingerprints, 38)
+    assert len(pairs) >= 30
+
+
+def test_capped_blocks_keep_buckets():
+    index = SimhashIndex(max_distance=38, blocks=10)
+    assert not index.scan
+    fp = random.Random(2).getrandbits(128)
+    index.add(1, fp)
+    # the 12 differing bits fall in the first two blocks, the other eight still match
+    assert index.query(fp ^ ((1 << 12) - 1)) == [1]
+
+
+def test_single_block_index_is_not_saved_to_mysql():
+    # a 128-bit block does not fit a BIGINT UNSIGNED part, and is rejected before touching the connection
+    with pytest.raises(ValueError, match="BIGINT UNSIGNED"):
+        DatabaseUtils.save_simhash_index(None, 'simhash_index', SimhashIndex(max_distance=0))
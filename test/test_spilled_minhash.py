@@ -0,0 +1,81 @@
+import os
+
+import numpy as np
+
+from processor.dd_algorithm import MinHashSimilarity
+from processor.dd_index import SpilledMinHashIndex
+
+
+def near_duplicate_signatures(seed=0, count=300, num_perm=64):
+    rng = np.random.RandomState(seed)
+    signatures = rng.randint(0, 1 << 32, (count, num_perm), dtype=np.uint64).astype(np.uint32)
+    for i in range(0, count, 10):
+        # every tenth row gets a near copy five rows later
+        copy = signatures[i].copy()
+        copy[:num_perm // 16] = rng.randint(0, 1 << 32, num_perm // 16, dtype=np.uint64).astype(np.uint32)
+        signatures[i + 5] = copy
+    return signatures
+
+
+def test_spilled_pairs_match_in_memory_index(tmp_path):
+    strategy = MinHashSimilarity(num_perm=64)
+    signatures = near_duplicate_signatures()
+    ids = list(range(1000, 1000 + len(signatures)))
+
+    index = strategy.create_index(0.7)
+    expected = []
+    for start in range(0, len(ids), 64):
+        strategy.index_batch(index, ids[start:start + 64], signatures[start:start + 64], expected)
+
+    spilled = SpilledMinHashIndex(str(tmp_path), 0.7, num_perm=64, spill_rows=50, chunk_rows=7)
+    for start in range(0, len(ids), 64):
+        spilled.insert_many(ids[start:start + 64], signatures[start:start + 64])
+    found = list(spilled.pairs())
+    spilled.close()
+
+    assert len(spilled.runs[0]) > 1
+    assert sorted(found) == sorted((pair['id1'], pair['id2']) for pair in expected)
+    assert len(found) == 30
+    assert os.listdir(tmp_path) == []
+
+
+def test_streaming_spills_to_directory(tmp_path):
+    titles = ['比特币失手5万美元大关', '今日天气晴朗适合出游', '比特币失手5万美元大关！', '央行宣布下调存款准备金率']
+    batches = [[{'id': i, 'title': title} for i, title in enumerate(titles[:2])], [{'id': i + 2, 'title': title} for i, title in enumerate(titles[2:])]]
+
+    strategy = MinHashSimilarity(spill_directory=str(tmp_path / 'spill'), spill_rows=1)
+    pairs = strategy.find_similar_pairs_streaming(iter(batches), 'title', 0.7)
+
+    assert pairs == [{'id1': 0, 'id2': 2}]
+    assert os.listdir(tmp_path / 'spill') == []
+
+
+def test_pairs_sharing_several_bands_are_checked_once(tmp_path):
+    signatures = near_duplicate_signatures(count=20)
+    signatures[15] = signatures[3]
+
+    spilled = SpilledMinHashIndex(str(tmp_path), 0.7, num_perm=64, spill_rows=8, chunk_rows=3)
+    spilled.insert_many(list(range(20)), signatures)
+    found = list(spilled.pairs())
+    spilled.close()
+
+    assert sorted(found) == [(0, 5), (3, 15)]
+    assert spilled.candidate_count == 2
+
+
+def test_hot_bucket_is_verified_in_chunks(tmp_path):
+    signatures = near_duplicate_signatures(count=40)
+    # empty texts all get the same signature and share one bucket in every band
+    signatures[20:] = np.iinfo(np.uint32).max
+
+    spilled = SpilledMinHashIndex(str(tmp_path), 0.7, num_perm=64, chunk_rows=7)
+    chunks = []
+    verified = spilled.verified
+    spilled.verified = lambda band, candidates, *args: (chunks.append(len(candidates)), verified(band, candidates, *args))[1]
+    spilled.insert_many(list(range(40)), signatures)
+    found = list(spilled.pairs())
+    spilled.close()
+
+    assert max(chunks) <= 7
+    assert len([pair for pair in found if pair[0] >= 20]) == 20 * 19 // 2
+    assert spilled.candidate_count == len(found)
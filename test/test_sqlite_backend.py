@@ -0,0 +1,70 @@
+import pandas as pd
+
+from processor.db_backend import SQLiteBackend
+from processor.db_sharded import ShardedReader
+from processor.db_sqlite_utils import SqliteUtils
+from processor.dd_processor import DdProcessor
+
+
+TITLES = ['比特币失手5万美元大关', '今日天气晴朗适合出游', '比特币失手5万美元大关！', '央行宣布降准0.5个百分点', '今日天气晴朗适合出游']
+
+
+def load(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / 'articles.sqlite3'))
+    connection = backend.connect()
+    SqliteUtils.load_dataframe_to_sqlite(pd.DataFrame({'id': range(1, 6), 'title': TITLES}), 'articles_info', connection)
+    return backend, connection
+
+
+def ids(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT id FROM articles_info ORDER BY id")
+        return [row[0] for row in cursor.fetchall()]
+
+
+def test_dedup_deletes_on_sqlite(tmp_path):
+    backend, connection = load(tmp_path)
+
+    DdProcessor(method='minhash', backend=backend).dd_similarity(connection, 'title')
+
+    assert ids(connection) == [1, 2, 4]
+
+
+def test_streaming_mark_on_sqlite(tmp_path):
+    backend, connection = load(tmp_path)
+
+    DdProcessor(method='simhash', backend=backend, removal='mark', streaming=True, fetch_size=2).dd_similarity(connection, 'title')
+
+    with connection.cursor(dictionary=True) as cursor:
+        cursor.execute("SELECT id, dup_of FROM articles_info ORDER BY id")
+        assert [row['dup_of'] for row in cursor.fetchall()] == [None, None, 1, None, 2]
+
+
+def test_sharded_reads_match_a_single_read(tmp_path):
+    backend, connection = load(tmp_path)
+    backend.read_shards, backend.read_workers = 3, 2
+
+    batches = list(backend.read_batches(connection, "SELECT id, title FROM articles_info", 'articles_info', 'id', batch_size=1))
+
+    assert [row['id'] for batch in batches for row in batch] == [1, 2, 3, 4, 5]
+    assert ShardedReader.id_ranges(connection, 'articles_info', 'id', 3) == [(1, 2), (3, 4), (5, 5)]
+
+    DdProcessor(method='minhash', backend=backend, streaming=True, fetch_size=2).dd_similarity(connection, 'title')
+    assert ids(connection) == [1, 2, 4]
+
+
+def test_incremental_keeps_every_indexed_row(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / 'articles.sqlite3'))
+    connection = backend.connect()
+    index_path = str(tmp_path / 'index.pkl')
+    processor = DdProcessor(threshold=0.6, method='simhash', backend=backend, strategy_options={'tokenizer': 'char'})
+
+    SqliteUtils.load_dataframe_to_sqlite(pd.DataFrame({'id': [1, 2], 'title': ['比特币大涨', '央行降准了']}), 'articles_info', connection)
+    processor.dd_incremental(connection, 'title', index_path)
+    # the new row is similar to both indexed rows, which are not similar to each other
+    SqliteUtils.load_dataframe_to_sqlite(pd.DataFrame({'id': [3], 'title': ['比特币大涨央行降准了']}), 'articles_info', connection)
+    processor.dd_incremental(connection, 'title', index_path)
+
+    assert ids(connection) == [1, 2]
+    assert processor.clusters.duplicates() == {3: 1}
+    assert sorted(DdProcessor.load_index_state(index_path)['index'].fingerprints) == [1, 2]
@@ -0,0 +1,23 @@
+from processor.dd_algorithm import ProcessTools
+
+
+def test_exact_and_contained_texts_are_paired():
+    texts = [
+        "比特币失手5万美元大关",
+        "今天天气很好",
+        "快讯：比特币失手5万美元大关，日内跌幅12%",
+        "比特币 失手5万美元大关！",
+        "",
+        "无关新闻",
+    ]
+    ids = [10, 11, 12, 13, 14, 15]
+
+    pairs = {(pair['id1'], pair['id2']) for pair in ProcessTools.find_contained_pairs(ids, texts)}
+
+    assert pairs == {(10, 13), (10, 12)}
+
+
+def test_later_substring_is_paired_with_earlier_text():
+    pairs = ProcessTools.find_contained_pairs([1, 2], ["工银投资成立绿能股权投资合伙企业", "绿能股权投资"])
+
+    assert pairs == [{'id1': 1, 'id2': 2}]
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from processor.dd_algorithm import TfidfSimilarity
+from processor.dd_tfidf_model import TfidfModel
+
+
+CORPUS = ['比特 币 失手 美元 大关', '今日 天气 晴朗 适合 出游', '央行 宣布 下调 存款 准备金率', '比特 币 价格 回升']
+
+
+def test_fitted_model_matches_vectorizer(tmp_path):
+    model = TfidfModel().fit(CORPUS)
+    expected = TfidfVectorizer().fit_transform(CORPUS).toarray()
+
+    assert np.allclose(model.transform(CORPUS).toarray(), expected)
+
+    model.save(str(tmp_path))
+    loaded = TfidfModel.load(str(tmp_path))
+    assert isinstance(loaded.idf, np.memmap)
+    assert loaded.version == model.version
+    assert np.allclose(loaded.transform(CORPUS).toarray(), expected)
+
+
+def test_stopwords_and_term_weights():
+    plain = TfidfModel().fit(CORPUS)
+    model = TfidfModel(stopwords=['美元'], term_weights={'比特': 0.0}).fit(CORPUS)
+
+    assert '美元' not in model.vocabulary
+    row = model.transform(['比特 美元 大关']).toarray()[0]
+    assert row[model.vocabulary['比特']] == 0 and row[model.vocabulary['大关']] == pytest.approx(1.0)
+    assert model.version != plain.version
+
+
+def test_hashing_model_needs_no_fit():
+    model = TfidfModel(hashing=True, n_features=2 ** 10)
+    matrix = model.transform(CORPUS)
+
+    assert matrix.shape == (4, 2 ** 10)
+    assert np.allclose(np.sqrt(matrix.multiply(matrix).sum(axis=1)), 1)
+
+    weighted = TfidfModel(hashing=True, n_features=2 ** 10, term_weights={'比特': 0.0})
+    assert weighted.transform(['比特']).nnz == 0
+
+
+def test_strategy_reuses_saved_model(tmp_path):
+    articles = [{'id': i, 'title': title} for i, title in enumerate(['今日天气晴朗适合出游', '今日天气晴朗，适合出游', '央行宣布下调存款准备金率'])]
+    strategy = TfidfSimilarity(tokenizer='char')
+    strategy.fit_model([article['title'] for article in articles], str(tmp_path))
+
+    reused = TfidfSimilarity(tokenizer='char', model_path=str(tmp_path))
+    assert reused.find_similar_pairs(articles, 'title', 0.7, 'id', sub_string=False) == [{'id1': 0, 'id2': 1}]
+
+    with pytest.raises(ValueError):
+        TfidfSimilarity(tokenizer='jieba', model_path=str(tmp_path)).find_similar_pairs(articles, 'title', 0.7, 'id', sub_string=False)
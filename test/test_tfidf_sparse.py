@@ -0,0 +1,31 @@
+import numpy as np
+from scipy.sparse import random as sparse_random
+from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.preprocessing import normalize
+
+from processor.dd_algorithm import TfidfSimilarity
+
+
+def test_sparse_pairs_match_dense_cosine():
+    matrix = normalize(sparse_random(60, 30, density=0.15, random_state=3, format='csr'))
+    dense = cosine_similarity(matrix)
+    expected = {(i, j) for i in range(60) for j in range(i + 1, 60) if dense[i, j] > 0.4}
+
+    pairs = list(TfidfSimilarity.sparse_cosine_pairs(matrix, 0.4, block_size=7))
+
+    assert len(pairs) == len(set(pairs))
+    assert set(pairs) == expected
+
+
+def test_top_k_keeps_best_neighbours():
+    matrix = normalize(sparse_random(40, 20, density=0.3, random_state=5, format='csr'))
+    dense = cosine_similarity(matrix)
+    np.fill_diagonal(dense, -1)
+
+    pairs = set(TfidfSimilarity.sparse_cosine_pairs(matrix, 0.2, block_size=9, top_k=1))
+
+    for i in range(40):
+        j = int(dense[i].argmax())
+        if dense[i, j] > 0.2:
+            assert (min(i, j), max(i, j)) in pairs
+    assert all(dense[i, j] > 0.2 and i < j for i, j in pairs)
@@ -0,0 +1,19 @@
+from processor.dd_algorithm import ProcessTools
+
+
+def test_char_shingles_share_grams_across_segmentation():
+    a = set(ProcessTools.char_shingles("工银投资", 2, type='list'))
+    b = set(ProcessTools.char_shingles("工银于近日投资", 2, type='list'))
+
+    assert a & b == {'工银', '投资'}
+    assert ProcessTools.char_shingles("工", 2, type='list') == ['工']
+    assert ProcessTools.char_shingles("，", 2, type='list') == []
+
+
+def test_tokenize_batch_selects_tokenizer():
+    texts = ["比特币失手5万美元大关", "工银投资"]
+
+    shingles = ProcessTools.tokenize_batch(texts, type='list', tokenizer='char', shingle_k=3)
+
+    assert shingles == [ProcessTools.char_shingles(text, 3, type='list') for text in texts]
+    assert ProcessTools.tokenize_batch(texts, type='list') == [ProcessTools.chinese_tokenizer(text, type='list') for text in texts]
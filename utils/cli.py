@@ -2,39 +2,100 @@ import os
 import configparser
 import argparse
 from functools import partial
-from processor.db_mysql_utils import DatabaseUtils
+from processor.db_backend import DatabaseBackend
 from processor.dd_processor import DdProcessor
+from processor.dd_algorithm import TfidfSimilarity
+from processor.dd_cache import DdCache
+from processor.dd_report import DdReport
+from processor.dd_storage import FileStorage
+from processor.dd_service import DdService, serve
 from pipeline_config import PipelineConfig
 
-def create_connection_workflow(db_config):
-    return DatabaseUtils.create_connection(
-        db_config['host'], 
-        db_config['user'], 
-        db_config['password'], 
-        db_config['database']
-    )
+def create_connection_workflow(backend):
+    return backend.connect()
+
+def create_cache_workflow(cache_config):
+    if cache_config and cache_config.getboolean('enabled', fallback=False):
+        return DdCache(cache_config['path'], cache_config.getint('max_entries', fallback=1000000))
+    return None
 
-def drop_table_workflow(connection, db_config):
+def create_storage_workflow(storage_config):
+    if storage_config and storage_config.get('backend', fallback='mysql') == 'file':
+        return FileStorage(storage_config['input_file'], storage_config.getint('chunk_size', fallback=5000))
+    return None
+
+def drop_table_workflow(backend, connection, db_config):
     if connection:
-        DatabaseUtils.drop_table_if_exists(connection, db_config['tablename'])
+        backend.drop_table_if_exists(connection, db_config['tablename'])
 
-def load_excel_workflow(connection, file_config, db_config):
+def load_excel_workflow(backend, connection, file_config, db_config):
     if connection:
-        DatabaseUtils.load_excel_to_mysql(file_config['input_excel'], "articles_info", connection)
-        DatabaseUtils.alter_column_type(connection, db_config['tablename'], "id", "INT", set_primary_key=True)
-        DatabaseUtils.show_table_structure(connection, db_config['tablename'])
+        backend.load_excel(file_config['input_excel'], "articles_info", connection, db_config.getint('batch_size', fallback=5000))
+        backend.show_table_structure(connection, db_config['tablename'])
 
-def process_data_workflow(connection, processor_config):
+def process_data_workflow(backend, connection, processor_config, cache=None, incremental=False, cluster_excel=None, report=None):
     if connection:
-        processor = DdProcessor(
-            threshold=float(processor_config['threshold']), 
-            method=processor_config['method']
-        )
-        processor.dd_similarity(connection, processor_config['process_column'])
+        processor = DdProcessor.from_config(processor_config, cache, report, backend)
+        if incremental:
+            processor.dd_incremental(connection, DdProcessor.parse_columns(processor_config['process_column']), processor_config['index_path'])
+        else:
+            processor.dd_similarity(connection, DdProcessor.parse_columns(processor_config['process_column']))
+        if cluster_excel:
+            processor.export_clusters(cluster_excel)
+        if cache is not None:
+            print(f"Cache hits: {cache.hits}, misses: {cache.misses}")
+
+def process_file_workflow(storage, storage_config, processor_config, cache=None, cluster_excel=None, report=None):
+    processor = DdProcessor.from_config(processor_config, cache, report)
+    processor.dd_file(
+        storage,
+        DdProcessor.parse_columns(processor_config['process_column']),
+        storage_config['output_file'],
+        storage_config.get('pairs_file', fallback='') or None
+    )
+    if cluster_excel:
+        processor.export_clusters(cluster_excel)
+    if cache is not None:
+        print(f"Cache hits: {cache.hits}, misses: {cache.misses}")
+
+def serve_workflow(processor_config, service_config):
+    service = DdService(
+        method=processor_config.get('method', fallback='minhash'),
+        threshold=processor_config.getfloat('threshold', fallback=0.7),
+        column=processor_config.get('process_column', fallback='title'),
+        snapshot_path=service_config.get('snapshot_path', fallback='') or processor_config.get('index_path'),
+        snapshot_interval=service_config.getfloat('snapshot_interval', fallback=300),
+        batch_window=service_config.getfloat('batch_window', fallback=0.005),
+        max_batch=service_config.getint('max_batch', fallback=256),
+        strategy_options=DdProcessor.strategy_options(processor_config)
+    )
+    serve(service, service_config.get('host', fallback='127.0.0.1'), service_config.getint('port', fallback=8765))
 
-def export_excel_workflow(connection, file_config, db_config):
+def fit_tfidf_workflow(processor_config, cache=None):
+    stopwords_path = processor_config.get('tfidf_stopwords', fallback='').strip()
+    stopwords = None
+    if stopwords_path:
+        with open(stopwords_path, encoding='utf-8') as f:
+            stopwords = [line.strip() for line in f if line.strip()]
+    term_weights = processor_config.get('tfidf_term_weights', fallback='').strip()
+    term_weights = DdProcessor.parse_columns(term_weights) if term_weights else None
+    
+    column = DdProcessor.parse_columns(processor_config['process_column'])
+    column = next(iter(column)) if isinstance(column, dict) else column
+    corpus = FileStorage(processor_config['tfidf_corpus'])
+    texts = [article[column] for batch in corpus.read_batches([column]) for article in batch]
+    
+    options = DdProcessor.strategy_options(processor_config)
+    strategy = TfidfSimilarity(cache=cache, tokenizer=options['tokenizer'], shingle_k=options['shingle_k'])
+    strategy.fit_model(
+        texts, processor_config['tfidf_model'], stopwords, term_weights,
+        processor_config.getboolean('tfidf_hashing', fallback=False),
+        processor_config.getint('tfidf_features', fallback=2 ** 20)
+    )
+
+def export_excel_workflow(backend, connection, file_config, db_config):
     if connection:
-        DatabaseUtils.export_mysql_to_excel(file_config['output_excel'], db_config['tablename'], connection)
+        backend.export_to_excel(file_config['output_excel'], db_config['tablename'], connection)
         connection.close()
         print("Connection closed.")
 
@@ -43,6 +104,9 @@ def main():
     parser.add_argument('--config', type=str, required=True, help='Path to the config file')
     parser.add_argument('--skip-drop', action='store_true', help='Skip dropping the table if it exists')
     parser.add_argument('--skip-load', action='store_true', help='Skip loading data from Excel to MySQL')
+    parser.add_argument('--incremental', action='store_true', help='Only check rows above the watermark of the persisted index (implies --skip-drop and --skip-load)')
+    parser.add_argument('--fit-tfidf', action='store_true', help='Fit the TF-IDF model on the tfidf_corpus file, save it to tfidf_model and exit')
+    parser.add_argument('--serve', action='store_true', help='Keep the index in memory and answer per-document duplicate checks over HTTP')
     
     args = parser.parse_args()
     
@@ -52,28 +116,56 @@ def main():
     db_config = config['database']
     file_config = config['files']
     processor_config = config['processor']
+    cache_config = config['cache'] if config.has_section('cache') else {}
+    reporting_config = config['reporting'] if config.has_section('reporting') else {}
+    storage_config = config['storage'] if config.has_section('storage') else {}
+    
+    if args.fit_tfidf:
+        cache = create_cache_workflow(cache_config)
+        fit_tfidf_workflow(processor_config, cache)
+        if cache is not None:
+            cache.close()
+        return
+    
+    if args.serve:
+        serve_workflow(processor_config, config['service'] if config.has_section('service') else config['DEFAULT'])
+        return
+    
+    incremental = args.incremental or processor_config.get('mode', fallback='full') == 'incremental'
     
-    connection_workflow = partial(create_connection_workflow, db_config)
-    connection = connection_workflow()
+    cache = create_cache_workflow(cache_config)
+    report = DdReport.from_config(reporting_config)
+    storage = create_storage_workflow(storage_config)
     
     workflows = []
-    if not args.skip_drop:
-        workflows.append(partial(drop_table_workflow, connection, db_config))
-    if not args.skip_load:
-        workflows.append(partial(load_excel_workflow, connection, file_config, db_config))
-    workflows.append(partial(process_data_workflow, connection, processor_config))
-    workflows.append(partial(export_excel_workflow, connection, file_config, db_config))
+    if storage is not None:
+        # file backend: read, dedup and write files, no database connection
+        workflows.append(partial(process_file_workflow, storage, storage_config, processor_config, cache, file_config.get('cluster_excel'), report))
+    else:
+        # mysql or a local sqlite file
+        backend = DatabaseBackend.from_config(storage_config.get('backend', fallback='mysql') if storage_config else 'mysql', db_config)
+        connection_workflow = partial(create_connection_workflow, backend)
+        connection = connection_workflow()
+        
+        if not (args.skip_drop or incremental):
+            workflows.append(partial(drop_table_workflow, backend, connection, db_config))
+        if not (args.skip_load or incremental):
+            workflows.append(partial(load_excel_workflow, backend, connection, file_config, db_config))
+        workflows.append(partial(process_data_workflow, backend, connection, processor_config, cache, incremental, file_config.get('cluster_excel'), report))
+        workflows.append(partial(export_excel_workflow, backend, connection, file_config, db_config))
     
     pipeline = PipelineConfig(
         root_dir=os.getcwd(),
         input=None,
-        reporting=None,
-        storage=None,
-        cache=None,
+        reporting=report if report.enabled else None,
+        storage=storage,
+        cache=cache,
         workflows=workflows
     )
     
     pipeline.run()
+    if cache is not None:
+        cache.close()
 
 if __name__ == "__main__":
     script_dir = os.path.dirname(os.path.abspath(__file__))
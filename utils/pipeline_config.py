@@ -8,6 +8,21 @@ class PipelineConfig:
         self.cache = cache
         self.workflows = workflows
 
+    @staticmethod
+    def workflow_name(workflow):
+        # workflows are partials of the *_workflow functions in cli.py
+        name = getattr(workflow, 'func', workflow).__name__
+        return name.removesuffix('_workflow')
+
     def run(self):
-        for workflow in self.workflows:
-            workflow()
\ No newline at end of file
+        if self.reporting is None:
+            for workflow in self.workflows:
+                workflow()
+            return
+        
+        try:
+            for workflow in self.workflows:
+                with self.reporting.stage(PipelineConfig.workflow_name(workflow)):
+                    workflow()
+        finally:
+            self.reporting.save()